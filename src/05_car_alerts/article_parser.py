@@ -14,17 +14,96 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
+# project imports
+import metrics
+
+
+# ------------------------------------------------------------------ #
+#  Vehicle‑page parsing (no driver needed)
+# ------------------------------------------------------------------ #
+_logger = logging.getLogger("ArticleParser")
+
+
+def parse_vehicle_details(soup: BeautifulSoup, logger: logging.Logger = _logger):
+    header = soup.find(
+        lambda t: t.name == "header"
+        and "Vehicle extras, add-ons and accessories" in t.get_text()
+    )
+    items, freetext = [], ""
+    if header:
+        ul = header.find_next("ul")
+        if ul:
+            items = [li.get_text(strip=True) for li in ul.find_all("li")]
+        div = ul.find_next("div") if ul else None
+        if div:
+            freetext = div.get_text(strip=True)
+    else:
+        logger.warning("Extras header not found.")
+    return items, freetext
+
+
+def parse_table_after_header(
+    soup: BeautifulSoup, header_text: str, logger: logging.Logger = _logger
+):
+    header = soup.find(lambda t: t.name == "header" and header_text in t.get_text())
+    data = []
+    if header:
+        table = header.find_next("table")
+        if table:
+            for row in table.find_all("tr"):
+                data.append(
+                    [c.get_text(strip=True) for c in row.find_all(["td", "th"])]
+                )
+        else:
+            logger.warning("Table missing after '%s'", header_text)
+    else:
+        logger.warning("Header '%s' not found.", header_text)
+    return data
+
+
+def parse_vehicle_soup(url: str, soup: BeautifulSoup, logger: logging.Logger = _logger) -> dict:
+    """Build the vehicle dict that is archived and matched."""
+    info = parse_table_after_header(soup, "Information", logger)
+    details, text = parse_vehicle_details(soup, logger)
+    return {
+        "url": url,
+        "information": {k.rstrip(":"): v for k, v in info},
+        "details_list": details,
+        "details_text": text,
+    }
+
+
+def parse_vehicle_html(url: str, html: str) -> dict:
+    """Like :func:`parse_vehicle_soup` for raw page source (picklable, for process pools)."""
+    return parse_vehicle_soup(url, BeautifulSoup(html, "html.parser"))
+
 
 class ArticleLinkParser:
     """
     Selenium‑based scraper that discovers listing URLs and parses vehicle pages.
 
-    :param headless:    start Chrome headless
-    :param delay_range: *(min, max)* random delay to mimic a human
+    :param headless:     start Chrome headless
+    :param delay_range:  *(min, max)* random delay to mimic a human
+    :param rate_limiter: shared per‑domain budget (see driver_pool.RateLimiter);
+                         replaces the random delay before each page load
+    :param http_fetcher: optional http_fetcher.HttpFetcher tried before Chrome
+                         for vehicle pages
+    :param snapshots:    optional snapshot_store.SnapshotStore that keeps every
+                         loaded listing / vehicle page
     """
 
-    def __init__(self, headless: bool = False, delay_range: tuple[int, int] = (1, 3)):
+    def __init__(
+        self,
+        headless: bool = False,
+        delay_range: tuple[int, int] = (1, 3),
+        rate_limiter=None,
+        http_fetcher=None,
+        snapshots=None,
+    ):
         self.delay_range = delay_range
+        self.rate_limiter = rate_limiter
+        self.http_fetcher = http_fetcher
+        self.snapshots = snapshots
         self.driver = None
         self._init_logger()
         self.setup_driver(headless)
@@ -70,6 +149,7 @@ class ArticleLinkParser:
         time.sleep(random.uniform(lo, hi))
 
     def scroll_page(self, scrolls: int = 3):
+        # render pauses for lazy-loaded content, not request pacing (see RateLimiter)
         for _ in range(scrolls):
             self.driver.execute_script(f"window.scrollBy(0,{random.randint(300,800)});")
             self.human_delay(0.5, 1.5)
@@ -79,22 +159,28 @@ class ArticleLinkParser:
     def get_all_links(self, url: str) -> list[dict]:
         """Return every ``<a>`` element as ``dict(url, text, element)``."""
         self.logger.debug("GET %s", url)
-        self.driver.get(url)
-        WebDriverWait(self.driver, 10).until(
-            EC.presence_of_element_located((By.TAG_NAME, "body"))
-        )
-        self.scroll_page()
-
-        links = []
-        for elem in self.driver.find_elements(By.TAG_NAME, "a"):
-            if href := elem.get_attribute("href"):
-                links.append(
-                    {
-                        "url": urljoin(url, href),
-                        "text": elem.text.strip(),
-                        "element": elem,
-                    }
-                )
+        if self.rate_limiter:
+            self.rate_limiter.wait(url)
+        with metrics.timer("listing_page_seconds"):
+            self.driver.get(url)
+            WebDriverWait(self.driver, 10).until(
+                EC.presence_of_element_located((By.TAG_NAME, "body"))
+            )
+            self.scroll_page()
+            if self.snapshots:
+                self.snapshots.put(url, self.driver.page_source, kind="listing")
+
+            links = []
+            for elem in self.driver.find_elements(By.TAG_NAME, "a"):
+                if href := elem.get_attribute("href"):
+                    links.append(
+                        {
+                            "url": urljoin(url, href),
+                            "text": elem.text.strip(),
+                            "element": elem,
+                        }
+                    )
+        metrics.inc("listing_pages_total")
         self.logger.info("Found %d links on page", len(links))
         return links
 
@@ -121,44 +207,40 @@ class ArticleLinkParser:
     # ------------------------------------------------------------------ #
     #  Vehicle‑page helpers
     # ------------------------------------------------------------------ #
+    def get_vehicle_html(self, vehicle_url: str) -> str:
+        """Page source of a vehicle page (plain HTTP first if a fetcher is set)."""
+        html = None
+        if self.http_fetcher:
+            with metrics.timer("vehicle_fetch_seconds", source="http"):
+                html = self.http_fetcher.get_vehicle_html(vehicle_url)
+        if html is None:
+            if self.http_fetcher:
+                self.logger.info("Static HTML incomplete, using Chrome for %s", vehicle_url)
+            with metrics.timer("politeness_wait_seconds"):
+                if self.rate_limiter:
+                    self.rate_limiter.wait(vehicle_url)
+                else:
+                    self.human_delay()
+            with metrics.timer("vehicle_fetch_seconds", source="chrome"):
+                self.driver.get(vehicle_url)
+                self.scroll_page()
+                html = self.driver.page_source
+            metrics.inc("vehicle_pages_total", source="chrome")
+        else:
+            metrics.inc("vehicle_pages_total", source="http")
+
+        if self.snapshots:
+            self.snapshots.put(vehicle_url, html)
+        return html
+
     def get_vehicle_soup(self, vehicle_url: str) -> BeautifulSoup:
-        self.human_delay()
-        self.driver.get(vehicle_url)
-        self.scroll_page()
-        return BeautifulSoup(self.driver.page_source, "html.parser")
+        return BeautifulSoup(self.get_vehicle_html(vehicle_url), "html.parser")
 
     def parse_vehicle_details(self, soup: BeautifulSoup):
-        header = soup.find(
-            lambda t: t.name == "header"
-            and "Vehicle extras, add-ons and accessories" in t.get_text()
-        )
-        items, freetext = [], ""
-        if header:
-            ul = header.find_next("ul")
-            if ul:
-                items = [li.get_text(strip=True) for li in ul.find_all("li")]
-            div = ul.find_next("div") if ul else None
-            if div:
-                freetext = div.get_text(strip=True)
-        else:
-            self.logger.warning("Extras header not found.")
-        return items, freetext
+        return parse_vehicle_details(soup, self.logger)
 
     def parse_table_after_header(self, soup: BeautifulSoup, header_text: str):
-        header = soup.find(lambda t: t.name == "header" and header_text in t.get_text())
-        data = []
-        if header:
-            table = header.find_next("table")
-            if table:
-                for row in table.find_all("tr"):
-                    data.append(
-                        [c.get_text(strip=True) for c in row.find_all(["td", "th"])]
-                    )
-            else:
-                self.logger.warning("Table missing after '%s'", header_text)
-        else:
-            self.logger.warning("Header '%s' not found.", header_text)
-        return data
+        return parse_table_after_header(soup, header_text, self.logger)
 
     # ------------------------------------------------------------------ #
     #   Main Entry Point
@@ -169,14 +251,19 @@ class ArticleLinkParser:
         max_pages: int,
         batch_size: int = 10,
         seen_links: set[str] | None = None,
+        crawl_index=None,
+        stop_on_known_page: bool = False,
     ):
         """
         Yield batches of *new* listing URLs.
 
-        :param base_url:   search URL without page params
-        :param max_pages:  pages to walk
-        :param batch_size: emit a list after this many links
-        :param seen_links: URLs to skip (already handled)
+        :param base_url:           search URL without page params
+        :param max_pages:          pages to walk
+        :param batch_size:         emit a list after this many links
+        :param seen_links:         URLs to skip (already handled)
+        :param crawl_index:        crawl_index.CrawlIndex; skips pages that are not due
+        :param stop_on_known_page: stop paging once a page has nothing due
+                                   (needs a listing sorted newest first)
         """
         seen_links = set() if seen_links is None else seen_links
         batch: list[str] = []
@@ -185,7 +272,17 @@ class ArticleLinkParser:
             page_url = f"{base_url}&currentPage={page}&pageType=next"
             self.logger.info("Scraping page %d", page)
 
-            for link in self.get_item_links(page_url):
+            links = self.get_item_links(page_url)
+            if crawl_index is not None:
+                crawl_index.touch(links)
+                due = crawl_index.due(links)
+                self.logger.info("  %d of %d listings due", len(due), len(links))
+                if stop_on_known_page and links and not due:
+                    self.logger.info("Page %d holds only known listings – stopping", page)
+                    break
+                links = due
+
+            for link in links:
                 if link in seen_links:
                     continue
                 batch.append(link)
@@ -0,0 +1,169 @@
+"""
+Backfill: score new or changed queries against recently archived cars.
+
+A query added in the GUI only sees cars scraped after it was saved. This
+command scores the queries that were not backfilled yet against the cars
+archived in the last ``backfill.days`` days, so their hits arrive without
+waiting for (or re‑crawling) those listings:
+
+    python backfill.py                    # pending queries, configured window
+    python backfill.py --days 7 --max-cars 10000
+    python backfill.py --all              # every query (the score cache keeps it cheap)
+
+The window is scored in chunks of ``backfill.chunk`` cars, each one
+matcher call whose micro‑batches ``backfill.workers`` forked scoring
+processes share (scoring_pool.py); progress is logged after each chunk.
+Cars a user was already mailed are skipped for that user, new hits are
+recorded in the sent files as in the daily job.
+A query counts as done (``data/backfill.json``) once its backfill finished;
+changing its text, brand or user makes it pending again.
+"""
+
+# standard library
+import argparse
+import json
+import logging
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# third party libraries
+import yaml
+
+# project imports
+import metrics
+from query_registry import QueryRegistry, QuerySnapshot
+from query_store import QUERIES_FILE, USERS_FILE, Hit, QueryStore, group_hits
+from token_cache import content_hash
+from vehicle_store import VehicleStore
+
+STATE_FILE = Path("data/backfill.json")
+
+_logger = logging.getLogger("Backfill")
+
+
+def query_key(row: dict) -> str:
+    """Identity of a query row for the backfill state (text, brand and owner)."""
+    return content_hash(json.dumps([row["user"], row.get("brand") or "", row["query"]]))
+
+
+def _load_state(path: Path = STATE_FILE) -> set[str]:
+    if not path.exists():
+        return set()
+    return set(json.loads(path.read_text(encoding="utf-8")).get("done", []))
+
+
+def _save_state(done: set[str], path: Path = STATE_FILE) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"done": sorted(done)}, indent=2), encoding="utf-8")
+
+
+def recent_cars(
+    data_dir: Path, storage_format: str, days: float = 3, max_cars: int = 5000
+) -> list[dict]:
+    """
+    Archived cars of the last *days* days (0 = all), at most the newest *max_cars*.
+
+    The jsonl archive is filtered by the timestamp of each row (rows migrated
+    from YAML have none and are left out); YAML files carry no timestamps,
+    so there a file counts as recent if it was written within the window.
+    """
+    cutoff = datetime.now() - timedelta(days=days) if days else None
+    newest: deque[dict] = deque(maxlen=max_cars or None)
+    if storage_format == "jsonl":
+        since = cutoff.isoformat(timespec="seconds") if cutoff else ""
+        for record in VehicleStore(data_dir).iter_records():
+            if cutoff is None or (record["ts"] and record["ts"] >= since):
+                newest.append(record["car"])
+        return list(newest)
+
+    for path in sorted(data_dir.glob("vehicles_data_*.yaml"), key=lambda p: p.stat().st_mtime):
+        if cutoff is not None and datetime.fromtimestamp(path.stat().st_mtime) < cutoff:
+            continue
+        with path.open("r", encoding="utf-8") as fh:
+            newest.extend((yaml.safe_load(fh) or {}).values())
+    return list(newest)
+
+
+def backfill(
+    matcher,
+    rows: list[dict],
+    cars: list[dict],
+    chunk: int = 256,
+    threshold: float = 0.5,
+) -> list[Hit]:
+    """
+    Score *rows* (query rows with ``user``) against *cars*, *chunk* cars per call.
+
+    Cars a user was already mailed are skipped for that user's queries.
+
+    :return: new hits; already added to the users' sent files
+    """
+    snapshot = QuerySnapshot(0, QueryStore(rows))  # pinned: not the registry's version
+    pool = matcher.scoring_pool
+    _logger.info(
+        "Backfilling %d queries against %d cars (%s)",
+        len(rows), len(cars),
+        f"{pool.workers} workers × {pool.threads} threads" if pool else "in process",
+    )
+    hits: list[Hit] = []
+    start = time.perf_counter()
+    for done in range(0, len(cars), chunk):
+        part = cars[done : done + chunk]
+        # one batch per chunk: its micro-batches keep every scoring worker busy
+        with metrics.timer("backfill_chunk_seconds"):
+            hits.extend(matcher.match_stream(part, len(part), threshold, queries=snapshot))
+        elapsed = time.perf_counter() - start
+        _logger.info(
+            "  %d/%d cars, %d hits (%.1f cars/s)",
+            done + len(part), len(cars), len(hits), (done + len(part)) / elapsed,
+        )
+    return hits
+
+
+def main():
+    # project imports
+    from orchestrator import CONFIG, DATA_DIR, STORAGE_FORMAT, THRESHOLD, build_matcher
+
+    settings = CONFIG.get("backfill", {})
+    p = argparse.ArgumentParser(description="Score new queries against recently archived cars")
+    p.add_argument("--days", type=float, default=settings.get("days", 3))
+    p.add_argument("--max-cars", type=int, default=settings.get("max_cars", 5000))
+    p.add_argument("--workers", type=int, default=settings.get("workers", 2))
+    p.add_argument("--chunk", type=int, default=settings.get("chunk", 256))
+    p.add_argument("--all", action="store_true", help="backfill every query, not only new ones")
+    args = p.parse_args()
+
+    snapshot = QueryRegistry(QUERIES_FILE, USERS_FILE).snapshot()
+    done = _load_state()
+    pending = [row for row in snapshot.queries if args.all or query_key(row) not in done]
+    if not pending:
+        _logger.info("No new queries – nothing to backfill")
+        return
+
+    cars = recent_cars(DATA_DIR, STORAGE_FORMAT, args.days, args.max_cars)
+    matcher = build_matcher(workers=args.workers)
+    try:
+        hits = backfill(matcher, pending, cars, args.chunk, THRESHOLD)
+    finally:
+        matcher.close()
+    for user, found in group_hits(hits).items():
+        _logger.info("  ↪ %d hits for %s – would send e‑mail", len(found), user)
+        for url, query in found:
+            _logger.info("    %s  ←  %s", url, query)
+
+    _save_state(done | {query_key(row) for row in pending})
+    _logger.info(
+        "✓ Backfill finished – %d queries, %d cars, %d hits", len(pending), len(cars), len(hits)
+    )
+
+
+if __name__ == "__main__":
+    handler = logging.StreamHandler()
+    handler.setFormatter(
+        logging.Formatter("[Backfill]: %(asctime)s  %(levelname)s  %(message)s", "%H:%M:%S")
+    )
+    _logger.addHandler(handler)
+    _logger.setLevel(logging.INFO)
+    main()
@@ -0,0 +1,212 @@
+"""
+Micro‑batching in front of the cross‑encoder (matcher.max_wait_ms), and
+:func:`iter_batches` for grouping a stream of cars by size or time.
+
+Callers on any thread hand over tokenized (query, vehicle) pairs and get a
+future for their scores. One worker thread collects the pairs of all
+pending requests until *max_batch* pairs are waiting or the oldest pair has
+waited *max_wait_ms*, groups them by sequence length (buckets of
+*bucket_width* tokens) and runs each bucket, sorted by length, through the
+model in passes of at most *max_batch*. Every pair is scored exactly as
+before, only the company it is padded with changes.
+"""
+
+# standard library
+import queue
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future
+
+# third party libraries
+import numpy as np
+
+# project imports
+import metrics
+
+
+class _Request:
+    __slots__ = ("features", "scores", "remaining", "future")
+
+    def __init__(self, features: list[dict]):
+        self.features = features
+        self.scores = np.empty(len(features), dtype=np.float32)
+        self.remaining = len(features)
+        self.future: Future = Future()
+
+
+class MicroBatcher:
+    """
+    :param forward:      scores a list of prepared features (one model pass)
+    :param max_batch:    pairs per forward pass; also flushes the queue when reached
+    :param max_wait_ms:  longest a pair waits for company
+    :param bucket_width: tokens per length bucket
+    """
+
+    def __init__(
+        self,
+        forward: Callable[[list[dict]], np.ndarray],
+        max_batch: int = 32,
+        max_wait_ms: float = 5.0,
+        bucket_width: int = 32,
+    ):
+        self.forward = forward
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.bucket_width = bucket_width
+        self._cond = threading.Condition()
+        self._pending: list[tuple[_Request, int]] = []
+        self._first = 0.0
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, features: list[dict]) -> Future:
+        """Queue prepared pairs; the future resolves to their scores in input order."""
+        request = _Request(features)
+        if not features:
+            request.future.set_result(request.scores)
+            return request.future
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            if not self._pending:
+                self._first = time.monotonic()
+            self._pending.extend((request, i) for i in range(len(features)))
+            self._cond.notify()
+        return request.future
+
+    def close(self) -> None:
+        """Score what is still queued, then stop the worker."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._worker.join()
+
+    # ------------------------------------------------------------------ #
+    #  Worker
+    # ------------------------------------------------------------------ #
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                deadline = self._first + self.max_wait
+                while len(self._pending) < self.max_batch and not self._closed:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._cond.wait(left)
+                items, self._pending = self._pending, []
+                metrics.observe("batcher_wait_seconds", time.monotonic() - self._first)
+            self._dispatch(items)
+
+    def _length(self, item: tuple[_Request, int]) -> int:
+        request, i = item
+        return len(request.features[i]["input_ids"])
+
+    def _dispatch(self, items: list[tuple[_Request, int]]) -> None:
+        buckets: dict[int, list[tuple[_Request, int]]] = defaultdict(list)
+        for item in items:
+            buckets[self._length(item) // self.bucket_width].append(item)
+
+        for _, group in sorted(buckets.items()):
+            group.sort(key=self._length)
+            for start in range(0, len(group), self.max_batch):
+                chunk = group[start : start + self.max_batch]
+                try:
+                    scores = self.forward([req.features[i] for req, i in chunk])
+                except Exception as exc:
+                    for req, _ in chunk:
+                        if not req.future.done():
+                            req.future.set_exception(exc)
+                    continue
+                metrics.inc("batcher_forward_passes_total")
+                metrics.inc("batcher_pairs_total", len(chunk))
+                for (req, i), score in zip(chunk, scores):
+                    if req.future.done():  # an earlier chunk of this request failed
+                        continue
+                    req.scores[i] = score
+                    req.remaining -= 1
+                    if not req.remaining:
+                        req.future.set_result(req.scores)
+
+
+# ------------------------------------------------------------------ #
+#  Stream batching
+# ------------------------------------------------------------------ #
+_END = object()
+
+
+def iter_batches(
+    items: Iterable, size: int, max_wait_s: float | None = None
+) -> Iterator[list]:
+    """
+    Group *items* into lists of at most *size*, the last one possibly shorter.
+
+    With *max_wait_s*, a partial batch is also emitted once its first item
+    has waited that long; the iterable is then read on a helper thread, so
+    a producer that blocks (e.g. a browser loading the next page) does not
+    hold back items that already arrived.
+    """
+    if max_wait_s is None:
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+        return
+
+    buffer: queue.Queue = queue.Queue(maxsize=2 * size)
+    stop = threading.Event()
+
+    def put(entry) -> bool:
+        # gives up once the consumer is gone instead of blocking forever
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+            put((_END, None))
+        except BaseException as exc:  # re-raised in the consumer
+            put((_END, exc))
+
+    threading.Thread(target=read, name="iter-batches", daemon=True).start()
+    batch, deadline = [], None
+    try:
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item, error = buffer.get(timeout=timeout)
+            except queue.Empty:
+                yield batch
+                batch, deadline = [], None
+                continue
+            if item is _END:
+                if batch:
+                    yield batch
+                if error is not None:
+                    raise error
+                return
+            batch.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + max_wait_s
+            if len(batch) >= size:
+                yield batch
+                batch, deadline = [], None
+    finally:
+        stop.set()
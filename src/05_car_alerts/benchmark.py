@@ -0,0 +1,398 @@
+"""
+End‑to‑end benchmark of the car‑alert pipeline without network or browser.
+
+Cars from ``data/vehicles_info.yaml`` are rendered into detail pages
+(``extractor.synthetic_page``) and pushed through the same code the daily
+job runs: parse → ``_save_batch_to_yaml`` / ``VehicleStore`` → ``CarMatcher``.
+Queries come from ``data/queries.json`` (per‑car latency, as in ``match``)
+and ``generated_questions.json`` (pair throughput).
+
+Reported: vehicles parsed/s (one core and the parse pool), persistence time
+per batch, model load time, pairs scored/s, p50/p95 per‑car match latency
+and peak RSS. The JSON report carries the commit so runs can be compared:
+
+    python benchmark.py --tiny-model --cars 200 --out bench.json
+    python benchmark.py --model path/to/model --compare bench.json
+
+``--scaling N`` adds pairs/s on 1, 2, 4 … N cores, spent once as forked
+scoring workers with one thread each (matcher.workers) and once as
+intra‑op threads of a single process.
+
+``--tiny-model`` builds a randomly initialised 2‑layer BERT with a
+vocabulary taken from the data, so the suite runs on a CPU‑only box
+(scores are meaningless, timings of everything around the model are not).
+
+Run with terminal from root directory 05_car_alerts.
+"""
+
+# standard library
+import argparse
+import json
+import logging
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+# third party libraries
+import numpy as np
+import torch
+import yaml
+
+# project imports
+from extractor import EXTRACTORS, extract_vehicle, synthetic_page
+from matcher import CarMatcher, create_vehicle_description
+from orchestrator import (
+    BACKEND,
+    BATCH_SIZE,
+    EXTRACTOR,
+    INFERENCE_BATCH_SIZE,
+    MODEL_PATH,
+    PARSE_WORKERS,
+    THRESHOLD,
+    _save_batch_to_yaml,
+)
+from parse_pool import ParsePool
+from url_set import ItemIdSet
+from vehicle_store import VehicleStore
+
+REPO_DATA = Path(__file__).resolve().parents[2] / "data"
+Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+_SPECIAL_TOKENS = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+
+
+# ------------------------------------------------------------------ #
+#  Inputs
+# ------------------------------------------------------------------ #
+def load_cars(vehicles_file: Path, n: int, seed: int = 0) -> list[dict]:
+    """*n* cars from the labelled archive, in the shape the scraper emits."""
+    with vehicles_file.open(encoding="utf-8") as fh:
+        vehicles = yaml.load(fh, Loader=Loader)
+    urls = sorted(vehicles)
+    rng = random.Random(seed)
+    picked = rng.sample(urls, n) if n < len(urls) else urls
+    return [
+        {
+            "url": url,
+            "information": vehicles[url].get("information_dict") or {},
+            "details_list": vehicles[url].get("details_list") or [],
+            "details_text": vehicles[url].get("details_text") or "",
+        }
+        for url in picked
+    ]
+
+
+def load_queries(questions_file: Path, n: int, seed: int = 0) -> list[str]:
+    """*n* distinct generated queries (for pair throughput)."""
+    questions = json.loads(questions_file.read_text(encoding="utf-8"))
+    queries = sorted({q for per_car in questions.values() for q in per_car})
+    return random.Random(seed).sample(queries, min(n, len(queries)))
+
+
+def build_tiny_model(out_dir: Path, texts: list[str], vocab_size: int = 4000, seed: int = 0) -> Path:
+    """
+    Save a randomly initialised 2‑layer BERT classifier + WordPiece tokenizer.
+
+    The vocabulary holds the *vocab_size* most frequent lower‑cased words of
+    *texts*, so sequence lengths are close to those of a real model.
+    """
+    # third party libraries
+    import torch
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+    words = Counter(w for t in texts for w in re.findall(r"\w+|[^\w\s]", t.lower()))
+    vocab = _SPECIAL_TOKENS + [w for w, _ in words.most_common(vocab_size)]
+    out_dir.mkdir(parents=True, exist_ok=True)
+    vocab_file = out_dir / "vocab.txt"
+    vocab_file.write_text("\n".join(vocab) + "\n", encoding="utf-8")
+    BertTokenizerFast(vocab_file=str(vocab_file), do_lower_case=True).save_pretrained(out_dir)
+
+    torch.manual_seed(seed)
+    config = BertConfig(
+        vocab_size=len(vocab),
+        hidden_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=128,
+        max_position_embeddings=512,
+        num_labels=2,
+    )
+    BertForSequenceClassification(config).eval().save_pretrained(out_dir)
+    return out_dir
+
+
+# ------------------------------------------------------------------ #
+#  Measurements
+# ------------------------------------------------------------------ #
+def peak_rss_mb() -> float | None:
+    """Peak resident set size of this process so far."""
+    try:
+        # standard library
+        import resource
+    except ImportError:  # Windows
+        try:
+            # third party libraries
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset / 2**20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def _percentiles(seconds: list[float]) -> dict:
+    ms = np.asarray(seconds) * 1000
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "mean_ms": float(ms.mean()),
+    }
+
+
+def bench_parse(pages: list[tuple[str, str]], engine: str, workers: int) -> dict:
+    quiet = logging.getLogger("benchmark.parse")
+    quiet.disabled = True
+    start = time.perf_counter()
+    cars = [EXTRACTORS[engine](url, html, quiet) for url, html in pages]
+    one_core = time.perf_counter() - start
+
+    pool = ParsePool(workers, extractor=engine)
+    try:
+        list(pool.imap(pages[:workers]))  # spawn the workers outside the timing
+        start = time.perf_counter()
+        pooled = list(pool.imap(pages))
+        in_pool = time.perf_counter() - start
+    finally:
+        pool.close()
+    return {
+        "engine": engine,
+        "pages": len(pages),
+        "vehicles_per_s": len(cars) / one_core,
+        "pool_workers": workers,
+        "pool_vehicles_per_s": len(pooled) / in_pool,
+    }
+
+
+def bench_persist(cars: list[dict], batch_size: int) -> dict:
+    logger = logging.getLogger("benchmark.persist")
+    logger.disabled = True
+    batches = [cars[i : i + batch_size] for i in range(0, len(cars), batch_size)]
+    report = {"cars": len(cars), "batch_size": batch_size}
+    for name in ("yaml", "jsonl"):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = VehicleStore(tmp) if name == "jsonl" else None
+            times = []
+            for batch in batches:
+                start = time.perf_counter()
+                if store is None:
+                    _save_batch_to_yaml(batch, logger, Path(tmp))
+                else:
+                    store.append(batch)
+                times.append(time.perf_counter() - start)
+        report[name] = {"total_s": sum(times), **_percentiles(times)}
+    return report
+
+
+def bench_matcher(
+    model_path: str,
+    backend: str,
+    cars: list[dict],
+    queries: list[str],
+    inference_batch_size: int,
+    threshold: float,
+) -> dict:
+    start = time.perf_counter()
+    matcher = CarMatcher(
+        model_path,
+        inference_batch_size=inference_batch_size,
+        score_cache=None,  # every pair goes through the model
+        backend=backend,
+        prefilter=False,
+    )
+    load_s = time.perf_counter() - start
+    matcher.sent_cache = ItemIdSet()  # in memory: data/sent.ids stays untouched
+
+    # throughput: every generated query against every car, one call
+    start = time.perf_counter()
+    scores = matcher.score_matrix(queries, cars)
+    matrix_s = time.perf_counter() - start
+
+    # latency: one car at a time through match(), against data/queries.json
+    matcher.vehicle_tokens.clear()
+    latencies = []
+    for car in cars:
+        start = time.perf_counter()
+        matcher.match([car], batch_size=1, threshold=threshold)
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        "model_load_s": load_s,
+        "pairs": int(scores.size),
+        "pairs_per_s": scores.size / matrix_s,
+        "match_latency": _percentiles(latencies),
+        "hits": len(matcher.sent_cache),
+    }
+
+
+def bench_scaling(
+    model_path: str,
+    backend: str,
+    cars: list[dict],
+    queries: list[str],
+    inference_batch_size: int,
+    max_cores: int,
+) -> dict:
+    """Pairs/s on 1, 2, 4 … *max_cores* cores: as scoring processes and as threads."""
+    powers = (2**i for i in range(max_cores.bit_length()))
+    steps = sorted({c for c in (1, max_cores, *powers) if c <= max_cores})
+    report: dict[str, dict[str, float]] = {"processes": {}, "threads": {}}
+
+    def pairs_per_s(**kwargs) -> float:
+        matcher = CarMatcher(
+            model_path,
+            inference_batch_size=inference_batch_size,
+            score_cache=None,
+            backend=backend,
+            prefilter=False,
+            **kwargs,
+        )
+        try:
+            matcher.score_matrix(queries[:1], cars[:inference_batch_size])  # warm‑up
+            start = time.perf_counter()
+            scores = matcher.score_matrix(queries, cars)
+            return scores.size / (time.perf_counter() - start)
+        finally:
+            matcher.close()
+
+    # forked runs first: a worker forked after the parent used its thread pool may hang
+    for cores in steps[1:]:
+        report["processes"][str(cores)] = pairs_per_s(workers=cores, threads_per_worker=1)
+    for cores in steps:
+        torch.set_num_threads(cores)
+        report["threads"][str(cores)] = pairs_per_s()
+    report["processes"]["1"] = report["threads"]["1"]
+    return report
+
+
+# ------------------------------------------------------------------ #
+#  Report
+# ------------------------------------------------------------------ #
+def _commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).parent,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def _flatten(report: dict, prefix: str = "") -> dict[str, float]:
+    flat = {}
+    for key, value in report.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(old: dict, new: dict) -> list[str]:
+    """One line per metric present in both reports: old → new (change)."""
+    a, b = _flatten(old["results"]), _flatten(new["results"])
+    lines = []
+    for key in a.keys() & b.keys():
+        change = f"{(b[key] - a[key]) / a[key]:+.1%}" if a[key] else "n/a"
+        lines.append(f"  {key:<40} {a[key]:12.3f} → {b[key]:12.3f}  ({change})")
+    return sorted(lines)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Car-alert pipeline benchmark")
+    p.add_argument("--vehicles", type=Path, default=REPO_DATA / "vehicles_info.yaml")
+    p.add_argument("--questions", type=Path, default=REPO_DATA / "generated_questions.json")
+    p.add_argument("--cars", type=int, default=200, help="cars to push through [default: 200]")
+    p.add_argument("--queries", type=int, default=20, help="generated queries for pairs/s")
+    p.add_argument("--model", default=MODEL_PATH, help="model dir [default: matcher.model_path]")
+    p.add_argument("--tiny-model", action="store_true", help="random 2-layer BERT instead")
+    p.add_argument("--backend", default=BACKEND, choices=["torch", "onnx"])
+    p.add_argument("--extractor", default=EXTRACTOR, choices=list(EXTRACTORS))
+    p.add_argument("--skip-model", action="store_true", help="parse + persist only")
+    p.add_argument("--scaling", type=int, default=0, metavar="N", help="pairs/s on 1 … N cores")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--out", type=Path, help="write the report as JSON")
+    p.add_argument("--compare", type=Path, help="earlier JSON report to diff against")
+    args = p.parse_args()
+
+    cars = load_cars(args.vehicles, args.cars, args.seed)
+    rng = random.Random(args.seed)
+    pages = [(car["url"], synthetic_page(car, rng)) for car in cars]
+    parsed = [extract_vehicle(url, html, args.extractor) for url, html in pages]
+
+    results = {
+        "parse": bench_parse(pages, args.extractor, PARSE_WORKERS),
+        "persist": bench_persist(parsed, BATCH_SIZE),
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        model = args.model
+        if args.tiny_model:
+            texts = [create_vehicle_description(car) for car in cars]
+            texts += load_queries(args.questions, 1000, args.seed)
+            model = str(build_tiny_model(Path(tmp) / "tiny_bert", texts, seed=args.seed))
+        if args.scaling and not args.skip_model:
+            # before anything else runs the model in this process (see bench_scaling)
+            results["scaling"] = bench_scaling(
+                model,
+                args.backend,
+                parsed,
+                load_queries(args.questions, args.queries, args.seed),
+                INFERENCE_BATCH_SIZE,
+                args.scaling,
+            )
+        if not args.skip_model:
+            results["match"] = bench_matcher(
+                model,
+                args.backend,
+                parsed,
+                load_queries(args.questions, args.queries, args.seed),
+                INFERENCE_BATCH_SIZE,
+                THRESHOLD,
+            )
+    results["peak_rss_mb"] = peak_rss_mb()
+
+    report = {
+        "commit": _commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "args": {
+            "cars": len(cars),
+            "queries": args.queries,
+            "model": "tiny-random-bert" if args.tiny_model else args.model,
+            "backend": args.backend,
+            "extractor": args.extractor,
+        },
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2))
+    if args.compare:
+        old = json.loads(args.compare.read_text())
+        print(f"\n{old.get('commit')} → {report['commit']}")
+        print("\n".join(compare(old, report)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Persistent index of listing URLs for incremental crawls (scraper.incremental).
+
+For every detail page the index remembers when it was first and last seen
+on a result page and when it was last fetched. A URL is *due* when it was
+never fetched, or when ``revisit_ttl_hours`` > 0 and the last fetch is older
+than that (auction data such as the mileage note may still change).
+"""
+
+# standard library
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable
+from pathlib import Path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    url        TEXT PRIMARY KEY,
+    first_seen REAL NOT NULL,
+    last_seen  REAL NOT NULL,
+    fetched    REAL
+) WITHOUT ROWID
+"""
+_CHUNK = 500  # stay well below SQLite's host‑parameter limit
+
+
+class CrawlIndex:
+    """
+    SQLite store of seen / fetched listing URLs.
+
+    :param path:              database file (created on demand)
+    :param revisit_ttl_hours: re‑fetch pages older than this (0 = never)
+    """
+
+    def __init__(self, path: str | Path, revisit_ttl_hours: float = 0):
+        self.path = Path(path)
+        self.ttl = revisit_ttl_hours * 3600
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(self.path, check_same_thread=False)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute(_SCHEMA)
+        self._con.commit()
+
+    def touch(self, urls: Iterable[str]) -> None:
+        """Record that *urls* are listed right now."""
+        now = time.time()
+        with self._lock:
+            self._con.executemany(
+                "INSERT INTO listings (url, first_seen, last_seen) VALUES (?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET last_seen = excluded.last_seen",
+                ((url, now, now) for url in urls),
+            )
+            self._con.commit()
+
+    def due(self, urls: Iterable[str]) -> list[str]:
+        """Return the URLs (in input order) whose detail page should be fetched."""
+        urls = list(urls)
+        fetched: dict[str, float | None] = {}
+        with self._lock:
+            for i in range(0, len(urls), _CHUNK):
+                chunk = urls[i : i + _CHUNK]
+                rows = self._con.execute(
+                    "SELECT url, fetched FROM listings "
+                    f"WHERE url IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                fetched.update(rows)
+        cutoff = time.time() - self.ttl
+        return [
+            url
+            for url in urls
+            if fetched.get(url) is None or (self.ttl and fetched[url] < cutoff)
+        ]
+
+    def mark_fetched(self, urls: Iterable[str], when: float | None = None) -> None:
+        """Record a successful fetch + parse of *urls*."""
+        when = time.time() if when is None else when
+        with self._lock:
+            self._con.executemany(
+                "INSERT INTO listings (url, first_seen, last_seen, fetched) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET fetched = excluded.fetched",
+                ((url, when, when, when) for url in urls),
+            )
+            self._con.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._con.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._con.close()
@@ -0,0 +1,154 @@
+"""
+Pool of Selenium drivers that fetch vehicle pages concurrently.
+
+Every worker owns its own ``ArticleLinkParser`` (one Chrome each). Instead of
+each driver sleeping on its own, all of them share a per‑domain politeness
+budget (requests per minute), so N drivers cut wall‑clock time roughly N‑fold
+while the site sees the same request rate.
+"""
+
+# standard library
+import logging
+import queue
+import random
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any
+from urllib.parse import urlparse
+
+# project imports
+from article_parser import ArticleLinkParser
+
+
+class RateLimiter:
+    """
+    Thread‑safe, per‑domain request budget.
+
+    Requests to one domain are spaced ``60 / requests_per_minute`` seconds
+    apart (plus a little jitter), no matter how many threads ask.
+
+    :param requests_per_minute: total budget per domain
+    :param jitter:              extra random share of the interval (0.2 = up to +20 %)
+    """
+
+    def __init__(self, requests_per_minute: float, jitter: float = 0.2):
+        self.interval = 60.0 / requests_per_minute
+        self.jitter = jitter
+        self._next_slot: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str) -> None:
+        """Block until the next request to the domain of *url* is allowed."""
+        domain = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(domain, now))
+            gap = self.interval * (1 + random.uniform(0, self.jitter))
+            self._next_slot[domain] = slot + gap
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class DriverPool:
+    """
+    N ``ArticleLinkParser`` workers fed from a queue.
+
+    :param size:                number of Chrome instances
+    :param headless:            start Chrome headless
+    :param delay_range:         scroll delays inside a page (see ArticleLinkParser)
+    :param rate_limiter:        shared politeness budget for all drivers
+    :param http_fetcher:        shared HttpFetcher tried before Chrome (thread‑safe session)
+    :param snapshots:           shared SnapshotStore for every loaded page
+    :param factory:             builds the workers instead of ArticleLinkParser
+                                (e.g. snapshot_store.ReplayParser)
+    """
+
+    def __init__(
+        self,
+        size: int,
+        headless: bool = False,
+        delay_range: tuple[int, int] = (1, 3),
+        rate_limiter: RateLimiter | None = None,
+        http_fetcher=None,
+        snapshots=None,
+        factory: Callable[[], ArticleLinkParser] | None = None,
+    ):
+        self.logger = logging.getLogger("ArticleParser")
+        self.size = size
+        self._idle: queue.Queue[ArticleLinkParser] = queue.Queue()
+        self._parsers: list[ArticleLinkParser] = []
+        try:
+            for _ in range(size):
+                parser = (
+                    factory()
+                    if factory
+                    else ArticleLinkParser(
+                        headless=headless,
+                        delay_range=delay_range,
+                        rate_limiter=rate_limiter,
+                        http_fetcher=http_fetcher,
+                        snapshots=snapshots,
+                    )
+                )
+                self._parsers.append(parser)
+                self._idle.put(parser)
+        except Exception:
+            self.close()
+            raise
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="driver")
+        self.logger.info("Driver pool ready (%d drivers)", size)
+
+    def _run(self, fn: Callable[[ArticleLinkParser, str], dict], url: str) -> dict:
+        parser = self._idle.get()
+        try:
+            return fn(parser, url)
+        finally:
+            self._idle.put(parser)
+
+    def submit(self, fn: Callable[[ArticleLinkParser, str], Any], url: str) -> Future:
+        """Run ``fn(parser, url)`` on the next idle driver."""
+        return self._executor.submit(self._run, fn, url)
+
+    def imap_unordered(
+        self,
+        urls: Iterable[str],
+        fn: Callable[[ArticleLinkParser, str], dict],
+    ) -> Iterator[dict]:
+        """
+        Apply ``fn(parser, url)`` to every URL and yield results in completion order.
+
+        *urls* is consumed lazily (at most two URLs per driver are in flight),
+        so it may be a generator that is still discovering links. Failed pages
+        are logged and skipped.
+        """
+        url_iter = iter(urls)
+        pending: dict[Future, str] = {}
+
+        def refill():
+            while len(pending) < 2 * self.size:
+                url = next(url_iter, None)
+                if url is None:
+                    return
+                pending[self.submit(fn, url)] = url
+
+        refill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                url = pending.pop(fut)
+                try:
+                    yield fut.result()
+                except Exception as exc:
+                    self.logger.error("Fetching %s failed: %s", url, exc, exc_info=True)
+            refill()
+
+    def close(self) -> None:
+        """Stop the workers and quit every Chrome instance."""
+        executor = getattr(self, "_executor", None)
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        for parser in self._parsers:
+            parser.close()
+        self._parsers.clear()
@@ -0,0 +1,91 @@
+"""
+Fold‑ensemble inference (matcher.ensemble).
+
+The training notebooks save one model per cross‑validation fold
+(``<run>/fold_1`` … ``fold_5``) and average their match probabilities.
+``FoldEnsemble`` does the same behind the ``predict_proba`` interface of
+``TorchBackend`` / ``OnnxBackend``, so ``CarMatcher`` tokenizes and pads
+each micro‑batch once and every fold model runs on that same batch.
+
+Early exit: after *min_folds* models, pairs whose running mean is at least
+*margin* away from the threshold are decided and skip the remaining folds
+(their score is the mean of the folds that ran). Only the undecided rows
+go to the next fold, trimmed to their own longest sequence.
+"""
+
+# standard library
+import re
+from pathlib import Path
+
+# third party libraries
+import numpy as np
+
+# project imports
+import metrics
+
+_FOLD_DIR = re.compile(r"fold_(\d+)$")
+
+
+def fold_dirs(run_dir: str | Path) -> list[Path]:
+    """``fold_N`` model directories below *run_dir*, in fold order."""
+    folds = [p for p in Path(run_dir).iterdir() if p.is_dir() and _FOLD_DIR.search(p.name)]
+    if not folds:
+        raise FileNotFoundError(f"No fold_N model directories in {run_dir}")
+    return sorted(folds, key=lambda p: int(_FOLD_DIR.search(p.name).group(1)))
+
+
+class FoldEnsemble:
+    """
+    Mean positive‑class probability over several fold backends.
+
+    :param backends:  one ``predict_proba`` backend per fold (same tokenizer)
+    :param threshold: decision threshold the early exit is measured against
+    :param min_folds: folds that always run (``len(backends)`` = no early exit)
+    :param margin:    distance from *threshold* at which a pair is decided
+    """
+
+    def __init__(self, backends: list, threshold: float = 0.5, min_folds: int = 2, margin: float = 0.35):
+        if not backends:
+            raise ValueError("FoldEnsemble needs at least one fold backend")
+        self.backends = backends
+        self.threshold = threshold
+        self.min_folds = max(1, min(min_folds, len(backends)))
+        self.margin = margin
+
+    def for_worker(self, threads: int) -> "FoldEnsemble":
+        """The same ensemble with every fold prepared for a forked scoring worker."""
+        return FoldEnsemble(
+            [backend.for_worker(threads) for backend in self.backends],
+            self.threshold,
+            self.min_folds,
+            self.margin,
+        )
+
+    def predict_proba(self, batch: dict[str, np.ndarray]) -> np.ndarray:
+        n = len(batch["input_ids"])
+        total = np.zeros(n, dtype=np.float64)
+        runs = np.zeros(n, dtype=np.int64)
+        active = np.arange(n)
+
+        for k, backend in enumerate(self.backends, start=1):
+            total[active] += backend.predict_proba(self._rows(batch, active))
+            runs[active] += 1
+            if k >= self.min_folds and k < len(self.backends):
+                mean = total[active] / k
+                active = active[np.abs(mean - self.threshold) < self.margin]
+                if not len(active):
+                    break
+
+        metrics.inc("ensemble_fold_passes_total", int(runs.sum()))
+        metrics.inc("ensemble_pairs_total", n)
+        return (total / runs).astype(np.float32)
+
+    @staticmethod
+    def _rows(batch: dict[str, np.ndarray], rows: np.ndarray) -> dict[str, np.ndarray]:
+        """*rows* of the batch, without the padding columns none of them uses."""
+        if len(rows) == len(batch["input_ids"]):
+            return batch
+        sub = {key: value[rows] for key, value in batch.items()}
+        used = np.flatnonzero(sub["attention_mask"].any(axis=0))
+        cols = slice(used[0], used[-1] + 1) if len(used) else slice(None)
+        return {key: value[:, cols] for key, value in sub.items()}
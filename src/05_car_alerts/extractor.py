@@ -0,0 +1,267 @@
+"""
+Pluggable extraction of the vehicle dict from a detail page (scraper.extractor).
+
+Engines, returning the dict shape of ``article_parser.parse_vehicle_soup``:
+
+* ``soup`` – the original code (default): two ``soup.find(lambda ...)``
+  walks plus ``find_next`` on an ``html.parser`` tree.
+* ``lxml`` – one walk over an ``lxml.html`` tree (C parser) that picks up
+  the "Information" table and the extras list / free text together; text
+  is collected with BeautifulSoup's rules (no script / style / template /
+  ruby text, comments skipped).
+
+The two parsers build different trees for some valid HTML: with omitted
+optional end tags (an unclosed ``<td>`` or ``<li>``) html.parser nests the
+following cells / items inside the open one, and ``<textarea>`` content is
+read differently. ``lxml`` therefore does not always give the same output;
+switch to it only after the parity check below lists no mismatches on
+recorded real pages (http_first feeds the engines raw server HTML, not
+Chrome's serialized DOM).
+
+Benchmark and parity check over saved detail pages (pages/s on one core):
+
+    python extractor.py path/to/html_fixtures
+    python extractor.py --synthetic 200   # pages rendered from data/vehicles_data_1.yaml
+"""
+
+# standard library
+import argparse
+import html as html_lib
+import json
+import logging
+import random
+import re
+import time
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+# third party libraries
+import yaml
+from bs4 import BeautifulSoup
+
+# project imports
+from article_parser import parse_vehicle_soup
+
+INFO_HEADER = "Information"
+EXTRAS_HEADER = "Vehicle extras, add-ons and accessories"
+# text BeautifulSoup's get_text() leaves out (html.parser string containers)
+_HIDDEN_TEXT = frozenset({"script", "style", "template", "rt", "rp"})
+
+# libxml2 turns \r\n into \n; html.parser keeps the \r (it shows up in details_text)
+_TEXT_WITH_CR = re.compile(r">[^<]*\r[^<]*<")
+
+_logger = logging.getLogger("ArticleParser")
+
+
+class _Sections:
+    """
+    State of the single walk.
+
+    Mirrors the original lookups: the *first* header whose text contains the
+    title, then the first ``table`` / ``ul`` (and the first ``div`` after
+    that ``ul``) that follows it in document order.
+    """
+
+    def __init__(self):
+        self.info_header = False
+        self.info_table = None
+        self.extras_header = False
+        self.extras_ul = None
+        self.extras_div = None
+
+    @property
+    def complete(self) -> bool:
+        return self.info_table is not None and self.extras_div is not None
+
+    def visit(self, name: str, node, header_text: Callable[[], str]) -> None:
+        # order matters: a header can itself be followed by (or contain) the target
+        if self.info_header and self.info_table is None and name == "table":
+            self.info_table = node
+        if self.extras_ul is not None and self.extras_div is None and name == "div":
+            self.extras_div = node
+        if self.extras_header and self.extras_ul is None and name == "ul":
+            self.extras_ul = node
+        if name == "header" and not (self.info_header and self.extras_header):
+            text = header_text()
+            if not self.info_header and INFO_HEADER in text:
+                self.info_header = True
+            if not self.extras_header and EXTRAS_HEADER in text:
+                self.extras_header = True
+
+
+def _finish(url: str, sections: _Sections, rows: list, items: list, freetext: str, logger) -> dict:
+    if not sections.info_header:
+        logger.warning("Header '%s' not found.", INFO_HEADER)
+    elif sections.info_table is None:
+        logger.warning("Table missing after '%s'", INFO_HEADER)
+    if not sections.extras_header:
+        logger.warning("Extras header not found.")
+    return {
+        "url": url,
+        "information": {k.rstrip(":"): v for k, v in rows},
+        "details_list": items,
+        "details_text": freetext,
+    }
+
+
+# ------------------------------------------------------------------ #
+#  Engines
+# ------------------------------------------------------------------ #
+def extract_soup(url: str, html: str, logger: logging.Logger = _logger) -> dict:
+    return parse_vehicle_soup(url, BeautifulSoup(html, "html.parser"), logger)
+
+
+def _lxml_strings(el) -> Iterator[str]:
+    """Text pieces of *el* in document order, following bs4's get_text rules."""
+    if isinstance(el.tag, str) and el.tag not in _HIDDEN_TEXT and el.text:
+        yield el.text
+    if isinstance(el.tag, str) and el.tag not in _HIDDEN_TEXT:
+        for child in el:
+            yield from _lxml_strings(child)
+            if child.tail:
+                yield child.tail
+
+
+def _lxml_text(el, strip: bool = True) -> str:
+    if not strip:
+        return "".join(_lxml_strings(el))
+    return "".join(s.strip() for s in _lxml_strings(el) if s.strip())
+
+
+def extract_lxml(url: str, html: str, logger: logging.Logger = _logger) -> dict:
+    try:
+        # third party libraries
+        import lxml.html
+    except ImportError as exc:
+        raise ImportError("scraper.extractor 'lxml' needs lxml: pip install lxml") from exc
+
+    if "\r" in html:
+        html = _TEXT_WITH_CR.sub(lambda m: m.group().replace("\r", "&#13;"), html)
+    root = lxml.html.document_fromstring(html)
+    sections = _Sections()
+    for el in root.iter():
+        if isinstance(el.tag, str):
+            sections.visit(el.tag, el, lambda el=el: _lxml_text(el, strip=False))
+            if sections.complete:
+                break
+
+    rows = []
+    if sections.info_table is not None:
+        rows = [
+            [_lxml_text(c) for c in row.iter("td", "th")]
+            for row in sections.info_table.iter("tr")
+        ]
+    items, freetext = [], ""
+    if sections.extras_ul is not None:
+        items = [_lxml_text(li) for li in sections.extras_ul.iter("li")]
+    if sections.extras_div is not None:
+        freetext = _lxml_text(sections.extras_div)
+    return _finish(url, sections, rows, items, freetext, logger)
+
+
+EXTRACTORS: dict[str, Callable[..., dict]] = {
+    "soup": extract_soup,
+    "lxml": extract_lxml,
+}
+
+
+def extract_vehicle(url: str, html: str, engine: str = "soup") -> dict:
+    """Vehicle dict of a detail page with the chosen engine (picklable, for process pools)."""
+    if engine not in EXTRACTORS:
+        raise ValueError(f"Unknown extractor: {engine!r}")
+    return EXTRACTORS[engine](url, html)
+
+
+# ------------------------------------------------------------------ #
+#  Benchmark / parity check
+# ------------------------------------------------------------------ #
+def synthetic_page(car: dict, rng: random.Random, filler: int = 300) -> str:
+    """
+    Render an archived car into a page shaped like an autobid.de detail page.
+
+    *filler* blocks of unrelated markup (menus, scripts, teaser cards) stand
+    in for the rest of the real page so tree size is in a realistic range.
+    """
+    esc = html_lib.escape
+
+    def noise(n: int) -> str:
+        return "".join(
+            f'<div class="card c{rng.randint(0, 99)}"><a href="/en/item/x-{rng.randint(1, 10**7)}#content">'
+            f"<span>Lot {i}</span></a><p>Teaser text {i} &amp; more</p></div>"
+            for i in range(n)
+        )
+
+    info = "".join(
+        f"<tr><td>{esc(k)}:</td><td>{esc(str(v))}</td></tr>"
+        for k, v in (car.get("information") or {}).items()
+    )
+    extras = "".join(f"<li>{esc(str(x))}</li>" for x in car.get("details_list") or [])
+    return (
+        "<!DOCTYPE html><html><head><title>autobid.de</title>"
+        "<script>window.__STATE__={\"header\":\"Information\"};</script>"
+        "<style>.card{margin:0}</style></head><body>"
+        f"<nav><header>Menu</header><ul><li>Search</li><li>Sell</li></ul></nav>{noise(filler // 2)}"
+        f'<section><header class="h">{INFO_HEADER}</header><div><table>{info}</table></div></section>'
+        f'<section><header class="h">{EXTRAS_HEADER}</header><ul>{extras}</ul>'
+        f"<div><p>{esc(car.get('details_text') or '')}</p></div></section>"
+        f"{noise(filler - filler // 2)}<footer><!-- footer -->© autobid.de</footer></body></html>"
+    )
+
+
+def load_pages(fixtures: Path | None, synthetic: int, archive: Path) -> list[tuple[str, str]]:
+    """``(url, html)`` of every ``*.html`` in *fixtures*, else *synthetic* rendered pages."""
+    if fixtures is not None:
+        return [(p.name, p.read_text(encoding="utf-8")) for p in sorted(fixtures.glob("*.html"))]
+    with archive.open(encoding="utf-8") as fh:
+        cars = list((yaml.safe_load(fh) or {}).values())
+    rng = random.Random(0)
+    return [(car["url"], synthetic_page(car, rng)) for car in rng.choices(cars, k=synthetic)]
+
+
+def benchmark(pages: list[tuple[str, str]], engines: list[str], repeat: int = 1) -> dict:
+    """pages/s per engine on this core and the pages whose output differs from ``soup``."""
+    quiet = logging.getLogger("extractor.bench")
+    quiet.disabled = True
+    reference = [extract_soup(url, html, quiet) for url, html in pages]
+
+    report = {"pages": len(pages), "engines": {}}
+    for name in engines:
+        fn = EXTRACTORS[name]
+        start = time.perf_counter()
+        for _ in range(repeat):
+            out = [fn(url, html, quiet) for url, html in pages]
+        elapsed = time.perf_counter() - start
+        report["engines"][name] = {
+            "pages_per_s": len(pages) * repeat / elapsed,
+            "mismatches": [url for (url, _), a, b in zip(pages, out, reference) if a != b],
+        }
+    soup_rate = report["engines"].get("soup", {}).get("pages_per_s")
+    for stats in report["engines"].values():
+        stats["speedup"] = stats["pages_per_s"] / soup_rate if soup_rate else None
+    return report
+
+
+def main():
+    p = argparse.ArgumentParser(description="Detail-page extractor benchmark")
+    p.add_argument("fixtures", type=Path, nargs="?", help="directory with saved *.html pages")
+    p.add_argument("--synthetic", type=int, default=100, help="rendered pages if no fixtures")
+    p.add_argument("--archive", type=Path, default=Path("data/vehicles_data_1.yaml"))
+    p.add_argument("--engines", nargs="+", default=list(EXTRACTORS), choices=list(EXTRACTORS))
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--out", type=Path, help="also write the report as JSON")
+    args = p.parse_args()
+
+    pages = load_pages(args.fixtures, args.synthetic, args.archive)
+    report = benchmark(pages, args.engines, args.repeat)
+    print(f"{report['pages']} pages × {args.repeat}")
+    for name, r in report["engines"].items():
+        print(
+            f"  {name:<5} {r['pages_per_s']:8.1f} pages/s/core  (×{r['speedup']:.2f})"
+            f"  mismatches={len(r['mismatches'])}"
+        )
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
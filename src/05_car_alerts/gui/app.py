@@ -1,29 +1,51 @@
 # standard library
 import copy
 import json
+import subprocess
+import sys
 import tkinter as tk
+from collections import deque
 from pathlib import Path
 from tkinter import messagebox, ttk
 
+# third party libraries
+import requests
+import yaml
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# project imports
+from matcher_service import DEFAULT_URL, MatcherClient
+from prefilter import compile_queries
+from query_store import DEFAULT_USER
+from vehicle_store import VehicleStore
+
 """
-GUI query manager – two‑column version (Queries | Car brand)
-===========================================================
+GUI query manager – three‑column version (Queries | Car brand | User)
+====================================================================
 
 Shortcuts & Controls
 --------------------
-• **Enter / Add**   – add a new row (Query required, Brand optional)
+• **Enter / Add**   – add a new row (Query required, Brand optional, User = default)
 • **Click a cell**  – pick column for autofill (only when entry box empty)
 • **Update**        – overwrite the selected row with the contents of the entry boxes
 • **Delete / Del**  – remove highlighted rows (multi‑select with Ctrl / Shift)
 • **Undo / Redo**   – Ctrl+Z / Ctrl+Y
+• **Matcher menu**  – score the selected query against recent cars (matcher_service.py),
+                      or backfill the saved queries against the archive (backfill.py)
 • **Finish**        – save & exit
 • **Cancel**        – exit without saving
 
-The list is persisted as a JSON array of objects with keys ``query`` and ``brand``.
+The list is persisted as a JSON array of objects with keys ``query``, ``brand`` and
+``user`` (whose sent file and recipients apply, see data/users.json), plus the hard
+``constraints`` the matcher's pre‑filter extracts from each query.
 """
 
 DATA_DIR = Path(__file__).resolve().parent.parent / "data"  # project‑level data dir
 QUERIES_FILE = DATA_DIR / "queries.json"
+CONFIG_FILE = DATA_DIR.parent / "config" / "orchestrator.yaml"
+TEST_CARS = 200  # most recently archived cars scored by "Test selected query"
+BACKFILL_LOG = DATA_DIR / "backfill.log"
 
 
 def load_queries() -> list[dict]:
@@ -35,6 +57,7 @@ def load_queries() -> list[dict]:
                 {
                     "query": str(item.get("query", "")),
                     "brand": str(item.get("brand", "")),
+                    "user": str(item.get("user") or DEFAULT_USER),
                 }
                 for item in raw
                 if isinstance(item, dict)
@@ -49,7 +72,7 @@ def load_queries() -> list[dict]:
 def save_queries(rows: list[dict]):
     DATA_DIR.mkdir(exist_ok=True)
     QUERIES_FILE.write_text(
-        json.dumps(rows, indent=2, ensure_ascii=False), encoding="utf-8"
+        json.dumps(compile_queries(rows), indent=2, ensure_ascii=False), encoding="utf-8"
     )
 
 
@@ -61,6 +84,7 @@ class QueryGUI(tk.Tk):
         "• Update       – overwrite the selected row.\n"
         "• Delete / Del – remove highlighted rows.\n"
         "• Undo / Redo  – Ctrl+Z / Ctrl+Y.\n"
+        "• Matcher      – test the selected query / backfill.\n"
         "• Finish       – save & exit.\n"
         "• Cancel       – exit without saving."
     )
@@ -68,14 +92,14 @@ class QueryGUI(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("Car‑Alert Query Manager")
-        self.geometry("660x560")
+        self.geometry("780x560")
         self.resizable(False, False)
 
         # -------- Data -------- #
         self.rows: list[dict] = load_queries()
         self.undo_stack: list[list[dict]] = []
         self.redo_stack: list[list[dict]] = []
-        self.selected_column: int | None = None  # 0 = query, 1 = brand
+        self.selected_column: int | None = None  # 0 = query, 1 = brand, 2 = user
 
         # -------- UI -------- #
         self._build_menu()
@@ -92,19 +116,69 @@ class QueryGUI(tk.Tk):
         menubar = tk.Menu(self)
         help_menu = tk.Menu(menubar, tearoff=0)
         help_menu.add_command(label="Controls", command=self.show_help)
+        matcher_menu = tk.Menu(menubar, tearoff=0)
+        matcher_menu.add_command(label="Test selected query", command=self.test_query)
+        matcher_menu.add_command(label="Backfill saved queries", command=self.start_backfill)
+        menubar.add_cascade(label="Matcher", menu=matcher_menu)
         menubar.add_cascade(label="Help", menu=help_menu)
         self.config(menu=menubar)
 
     def show_help(self):
         messagebox.showinfo("Help – Controls", self.HELP_TEXT)
 
+    def test_query(self):
+        """Score the selected query against recent cars on the matcher service."""
+        sel = self.tree.selection()
+        if len(sel) != 1:
+            messagebox.showinfo("Info", "Select exactly one row to test.")
+            return
+        query = self.rows[int(sel[0])]["query"]
+
+        # project imports
+        from matcher import create_vehicle_description
+
+        cars = list(deque(VehicleStore(DATA_DIR).iter_cars(), maxlen=TEST_CARS))
+        if not cars:
+            messagebox.showinfo("Info", "The archive is empty – run a scrape first.")
+            return
+        config = yaml.safe_load(CONFIG_FILE.read_text())
+        url = config["matcher"].get("service_url") or DEFAULT_URL
+        try:
+            scores = MatcherClient(url, timeout=60).score_pairs(
+                [(query, create_vehicle_description(car)) for car in cars]
+            )
+        except requests.RequestException as exc:
+            messagebox.showerror("Matcher", f"Matcher service at {url} not reachable:\n{exc}")
+            return
+        best = sorted(zip(scores.tolist(), cars), key=lambda sc: -sc[0])[:5]
+        messagebox.showinfo(
+            "Matcher – best of the last %d cars" % len(cars),
+            "\n".join(f"{score:.2f}  {car['url']}" for score, car in best),
+        )
+
+    def start_backfill(self):
+        """Score queries saved since the last backfill against recent cars (backfill.py)."""
+        if self.rows != load_queries():
+            messagebox.showinfo("Info", "Unsaved changes – Finish saves the queries first.")
+            return
+        DATA_DIR.mkdir(exist_ok=True)
+        with BACKFILL_LOG.open("a", encoding="utf-8") as log:
+            # runs on after the window closes; it loads the model itself
+            subprocess.Popen(
+                [sys.executable, "backfill.py"],
+                cwd=DATA_DIR.parent,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+            )
+        messagebox.showinfo("Backfill", f"Backfill started – progress in {BACKFILL_LOG}")
+
     # -------------------- Widgets -------------------- #
     def _build_widgets(self):
         # Treeview frame
         tv_frame = tk.Frame(self)
         tv_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
-        cols = ("query", "brand")
+        cols = ("query", "brand", "user")
         self.tree = ttk.Treeview(
             tv_frame,
             columns=cols,
@@ -115,7 +189,9 @@ class QueryGUI(tk.Tk):
         self.tree.heading("query", text="Queries")
         self.tree.heading("brand", text="Car brand")
         self.tree.column("query", width=320)
+        self.tree.heading("user", text="User")
         self.tree.column("brand", width=200)
+        self.tree.column("user", width=110)
 
         tv_scroll = tk.Scrollbar(tv_frame, orient=tk.VERTICAL, command=self.tree.yview)
         self.tree.configure(yscrollcommand=tv_scroll.set)
@@ -139,9 +215,14 @@ class QueryGUI(tk.Tk):
         self.entry_brand = tk.Entry(form, width=18)
         self.entry_brand.grid(row=0, column=3, sticky="w")
 
-        # Bind Enter in either entry to add
+        tk.Label(form, text="User:").grid(row=0, column=4, sticky="w", padx=(5, 0))
+        self.entry_user = tk.Entry(form, width=10)
+        self.entry_user.grid(row=0, column=5, sticky="w")
+
+        # Bind Enter in any entry to add
         self.entry_query.bind("<Return>", self.add_row)
         self.entry_brand.bind("<Return>", self.add_row)
+        self.entry_user.bind("<Return>", self.add_row)
 
         # --- Action buttons --- #
         btn_row = tk.Frame(self)
@@ -173,12 +254,13 @@ class QueryGUI(tk.Tk):
         self.tree.delete(*self.tree.get_children())
         for idx, row in enumerate(self.rows):
             self.tree.insert(
-                "", tk.END, iid=str(idx), values=(row["query"], row["brand"])
+                "", tk.END, iid=str(idx), values=(row["query"], row["brand"], row["user"])
             )
 
     def clear_entries(self):
         self.entry_query.delete(0, tk.END)
         self.entry_brand.delete(0, tk.END)
+        self.entry_user.delete(0, tk.END)
 
     # -------------------- Undo/Redo -------------------- #
     def push_undo(self):
@@ -222,25 +304,30 @@ class QueryGUI(tk.Tk):
             self.entry_query.insert(0, row["query"])
         elif self.selected_column == 1 and not self.entry_brand.get().strip():
             self.entry_brand.insert(0, row["brand"])
+        elif self.selected_column == 2 and not self.entry_user.get().strip():
+            self.entry_user.insert(0, row["user"])
         elif (
             self.selected_column is None
             and not self.entry_query.get().strip()
             and not self.entry_brand.get().strip()
+            and not self.entry_user.get().strip()
         ):
             self.entry_query.insert(0, row["query"])
             self.entry_brand.insert(0, row["brand"])
+            self.entry_user.insert(0, row["user"])
 
     # -------------------- CRUD -------------------- #
     def add_row(self, _evt=None):
         q = self.entry_query.get().strip()
         b = self.entry_brand.get().strip()
+        u = self.entry_user.get().strip() or DEFAULT_USER
         if not q:
             return  # Query is mandatory
-        if any(r["query"] == q and r["brand"] == b for r in self.rows):
+        if any(r["query"] == q and r["brand"] == b and r["user"] == u for r in self.rows):
             messagebox.showinfo("Info", "Entry already exists.")
             return
         self.push_undo()
-        self.rows.append({"query": q, "brand": b})
+        self.rows.append({"query": q, "brand": b, "user": u})
         self.refresh_tree()
         self.tree.see(str(len(self.rows) - 1))
         self.clear_entries()
@@ -257,17 +344,18 @@ class QueryGUI(tk.Tk):
         # Determine new values – if entry box empty keep existing value
         new_q = self.entry_query.get().strip() or row["query"]
         new_b = self.entry_brand.get().strip() or row["brand"]
+        new_u = self.entry_user.get().strip() or row["user"]
 
         # Prevent duplicates except for the row being edited
         if any(
-            i != idx and r["query"] == new_q and r["brand"] == new_b
+            i != idx and r["query"] == new_q and r["brand"] == new_b and r["user"] == new_u
             for i, r in enumerate(self.rows)
         ):
             messagebox.showinfo("Info", "Another identical row already exists.")
             return
 
         self.push_undo()
-        self.rows[idx] = {"query": new_q, "brand": new_b}
+        self.rows[idx] = {"query": new_q, "brand": new_b, "user": new_u}
         self.refresh_tree()
         self.tree.selection_set(str(idx))
         self.clear_entries()
@@ -0,0 +1,154 @@
+"""
+Browser‑less fetch path for vehicle detail pages.
+
+A pooled ``requests`` session (keep‑alive, gzip) downloads the static HTML
+which then goes through the same ``parse_table_after_header`` /
+``parse_vehicle_details`` code as the Selenium path. Pages whose static HTML
+lacks the "Information" or extras section return ``None`` so the caller can
+fall back to Chrome.
+
+Check against saved pages (served by a local HTTP server):
+
+    python http_fetcher.py path/to/html_fixtures
+"""
+
+# standard library
+import argparse
+import functools
+import json
+import logging
+import random
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# third party libraries
+import requests
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# project imports
+from article_parser import parse_vehicle_html
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+REQUIRED_HEADERS = ("Information", "Vehicle extras, add-ons and accessories")
+
+
+def has_vehicle_sections(html: str, headers=REQUIRED_HEADERS) -> bool:
+    """True if every section header the parser needs is in the static HTML."""
+    # only <header> elements are built, far cheaper than a full parse
+    soup = BeautifulSoup(html, "html.parser", parse_only=SoupStrainer("header"))
+    texts = [h.get_text() for h in soup.find_all("header")]
+    return all(any(wanted in text for text in texts) for wanted in headers)
+
+
+class HttpFetcher:
+    """
+    Pooled HTTP session for detail pages.
+
+    :param pool_size:    keep‑alive connections per host
+    :param timeout:      seconds per request
+    :param delay_range:  random pause before a request when no *rate_limiter* is set
+    :param rate_limiter: shared per‑domain budget (see driver_pool.RateLimiter)
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 8,
+        timeout: float = 15.0,
+        delay_range: tuple[float, float] = (1, 3),
+        rate_limiter=None,
+    ):
+        self.logger = logging.getLogger("ArticleParser")
+        self.timeout = timeout
+        self.delay_range = delay_range
+        self.rate_limiter = rate_limiter
+
+        self.session = requests.Session()
+        retry = Retry(
+            total=2,
+            backoff_factor=1.0,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET",),
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(
+            {
+                "User-Agent": USER_AGENT,
+                "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+                "Accept-Language": "en-GB,en;q=0.9",
+                "Accept-Encoding": "gzip, deflate",
+                "Connection": "keep-alive",
+            }
+        )
+
+    def _pace(self, url: str) -> None:
+        if self.rate_limiter:
+            self.rate_limiter.wait(url)
+        elif self.delay_range:
+            time.sleep(random.uniform(*self.delay_range))
+
+    def fetch_html(self, url: str) -> str | None:
+        """Return the page HTML, or ``None`` on any HTTP / network error."""
+        self._pace(url)
+        try:
+            resp = self.session.get(url, timeout=self.timeout)
+            resp.raise_for_status()
+        except requests.RequestException as exc:
+            self.logger.warning("HTTP fetch failed for %s: %s", url, exc)
+            return None
+        return resp.text
+
+    def get_vehicle_html(self, url: str) -> str | None:
+        """Static page source, or ``None`` if the sections need a browser."""
+        html = self.fetch_html(url)
+        if html is None or not has_vehicle_sections(html):
+            return None
+        return html
+
+    def close(self) -> None:
+        self.session.close()
+
+
+# ------------------------------------------------------------------ #
+#  Fixture check
+# ------------------------------------------------------------------ #
+def check_fixtures(fixture_dir: Path) -> list[dict]:
+    """
+    Serve *fixture_dir* on localhost and run every ``*.html`` through the HTTP path.
+    """
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=str(fixture_dir))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    fetcher = HttpFetcher(delay_range=None)
+    results = []
+    try:
+        for page in sorted(fixture_dir.glob("*.html")):
+            url = f"{base}/{page.name}"
+            html = fetcher.get_vehicle_html(url)
+            if html is None:
+                results.append({"url": url, "static": False})
+                continue
+            results.append({"static": True, **parse_vehicle_html(url, html)})
+    finally:
+        fetcher.close()
+        server.shutdown()
+    return results
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Parse saved detail pages over HTTP")
+    p.add_argument("fixtures", type=Path, help="directory with saved *.html pages")
+    args = p.parse_args()
+
+    for row in check_fixtures(args.fixtures):
+        print(json.dumps(row, ensure_ascii=False))
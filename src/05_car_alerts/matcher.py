@@ -1,18 +1,38 @@
 """
 Loads the ML model, the user queries, and the 'already mailed' cache.
-Runs match() on every Nth vehicle and returns a list of (url, query) hits.
+Runs match() / match_stream() on batches of vehicles and returns the (url, query, user) hits.
 """
 
 # standard library
 import json
+import math
 import random
 from pathlib import Path
-from typing import Iterable, List, Tuple
+from typing import Iterable, Iterator, List
+
+# third party libraries
+import numpy as np
 import torch
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 
-CACHE_FILE = Path("data/sent.json")
+# project imports
+import metrics
+from batching import MicroBatcher, iter_batches
+from ensemble import FoldEnsemble, fold_dirs
+from onnx_backend import load_onnx_backend
+from prefilter import constraint_row, vehicle_columns
+from query_registry import QueryRegistry, QuerySnapshot
+from query_store import DEFAULT_USER, USERS_FILE, Hit, SentToAll, sent_path
+from retriever import DEFAULT_MODEL as DEFAULT_RETRIEVER, BiEncoder, top_k_mask
+from score_cache import ScoreCache, model_fingerprint
+from scoring_pool import ScoringPool, can_fork
+from token_cache import TokenCache, content_hash
+from url_set import ItemIdSet
+
+CACHE_FILE = Path("data/sent.json")  # legacy, imported once into SENT_FILE
+SENT_FILE = Path("data/sent.ids")
 QUERIES_FILE = Path("data/queries.json")
+SCORE_CACHE_FILE = Path("data/scores.sqlite")
 
 # ------- helpers ---------------------------------------------------------- #
 
@@ -26,15 +46,176 @@ def _save(path: Path, obj) -> None:
     path.write_text(json.dumps(obj, ensure_ascii=False, indent=2))
 
 
+def create_vehicle_description(car_json: dict) -> str:
+    """Create a comprehensive vehicle description from the car data.
+    This should match the format used during training."""
+    description_parts = []
+
+    # Add information dictionary details
+    if 'information_dict' in car_json:
+        info_dict = car_json['information_dict']
+        for key, value in info_dict.items():
+            description_parts.append(f"{key}: {value}")
+
+    # Add details list
+    if 'details_list' in car_json:
+        details = " | ".join(car_json['details_list'])
+        description_parts.append(details)
+
+    # Add details text if available
+    if 'details_text' in car_json:
+        description_parts.append(car_json['details_text'])
+
+    # Fallback: if the structure is different, try to extract key info
+    if not description_parts:
+        # Handle alternative structure
+        if 'information' in car_json:
+            for key, value in car_json['information'].items():
+                description_parts.append(f"{key}: {value}")
+
+        if 'details' in car_json:
+            description_parts.append(car_json['details'])
+
+    return " | ".join(description_parts)
+
+
+def _truncate_longest_first(
+    ids: list[int], pair_ids: list[int], budget: int
+) -> tuple[list[int], list[int]]:
+    """
+    Same result as the tokenizer's ``truncation="longest_first"`` for a pair,
+    without the warning transformers logs on every truncated pair.
+    """
+    excess = len(ids) + len(pair_ids) - budget
+    if excess <= 0:
+        return ids, pair_ids
+    first_remove = min(abs(len(ids) - len(pair_ids)), excess)
+    second_remove = excess - first_remove
+    if len(ids) > len(pair_ids):
+        ids_cut = first_remove + second_remove // 2
+        pair_cut = second_remove - second_remove // 2
+    else:
+        ids_cut = second_remove // 2
+        pair_cut = first_remove + second_remove - second_remove // 2
+    return ids[: len(ids) - ids_cut], pair_ids[: len(pair_ids) - pair_cut]
+
+
+class TorchBackend:
+    """PyTorch inference for a loaded sequence-classification model."""
+
+    def __init__(self, model, device: torch.device):
+        self.model = model
+        self.device = device
+
+    def predict_proba(self, batch: dict[str, np.ndarray]) -> np.ndarray:
+        inputs = {k: torch.as_tensor(v, device=self.device) for k, v in batch.items()}
+        with torch.no_grad():
+            logits = self.model(**inputs).logits
+            # Probability of the positive class (index 1) - match probability
+            probs = torch.nn.functional.softmax(logits, dim=-1)[:, 1]
+        return probs.float().cpu().numpy()
+
+    def for_worker(self, threads: int) -> "TorchBackend":
+        """This backend in a forked scoring worker, limited to *threads* intra-op threads."""
+        torch.set_num_threads(threads)
+        return self
+
+
 class CarMatcher:
     """Stateful matcher that remembers what has been emailed, using a local file."""
 
-    def __init__(self, model_path: str):
-        self.model, self.tokenizer = self._load_model(model_path)
-        self.sent_cache: set[str] = set(_load(CACHE_FILE, []))
-        self.max_length = 512  # Same as used in training
+    def __init__(
+        self,
+        model_path: str,
+        inference_batch_size: int = 32,
+        score_cache: Path | None = SCORE_CACHE_FILE,
+        mode: str = "cross_encoder",
+        retriever_model: str = DEFAULT_RETRIEVER,
+        top_k: int = 3,
+        top_k_pool: int = 10,
+        prefilter: bool = False,
+        backend: str = "torch",
+        onnx_path: str | None = None,
+        onnx_quantize: bool = True,
+        max_wait_ms: float = 0,
+        length_bucket: int = 32,
+        ensemble: bool = False,
+        ensemble_threshold: float = 0.5,
+        ensemble_min_folds: int = 2,
+        ensemble_margin: float = 0.35,
+        workers: int = 1,
+        threads_per_worker: int = 0,
+        recipients: str | list[str] | None = None,
+        sent_file: Path | None = SENT_FILE,
+    ):
+        if mode not in ("cross_encoder", "retrieve_rerank"):
+            raise ValueError(f"Unknown matcher mode: {mode!r}")
+        if backend not in ("torch", "onnx"):
+            raise ValueError(f"Unknown matcher backend: {backend!r}")
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.model.to(self.device)
+        if ensemble:
+            # model_path is a training run with fold_1 … fold_N; one tokenizer for all
+            folds = fold_dirs(model_path)
+            self.model = None
+            self.tokenizer = AutoTokenizer.from_pretrained(folds[0])
+            self.backend = FoldEnsemble(
+                [self._load_backend(str(f), backend, None, onnx_quantize) for f in folds],
+                threshold=ensemble_threshold,
+                min_folds=ensemble_min_folds,
+                margin=ensemble_margin,
+            )
+        elif backend == "onnx":
+            # CPU inference through ONNX Runtime, exported on first use
+            self.model = None
+            self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+            self.backend = load_onnx_backend(model_path, onnx_path, onnx_quantize)
+        else:
+            self.model, self.tokenizer = self._load_model(model_path)
+            self.model.to(self.device)
+            self.backend = TorchBackend(self.model, self.device)
+        # mailed URLs keyed by item id, appended to sent.ids after every hit;
+        # further users get sent_<user>.ids (in memory if this one is, sent_file=None)
+        self.sent_cache = ItemIdSet(sent_file, legacy_json=CACHE_FILE)
+        self.sent_caches: dict[str, ItemIdSet] = {}
+        self.max_length = 512  # Same as used in training
+        # scores survive between runs; a changed model directory invalidates them
+        settings = [self.max_length, backend, backend == "onnx" and onnx_quantize]
+        if ensemble:
+            # early exit changes the scores of decided pairs
+            settings += ["ensemble", ensemble_threshold, ensemble_min_folds, ensemble_margin]
+        fingerprint = model_fingerprint(model_path, *settings)
+        self.score_cache = ScoreCache(score_cache, fingerprint) if score_cache else None
+        self.inference_batch_size = inference_batch_size  # pairs per forward pass
+        # token ids without special tokens; vehicles keyed by (url, content hash)
+        self.vehicle_tokens = TokenCache(self.tokenizer)
+        self.query_tokens = TokenCache(self.tokenizer)
+        # retrieve_rerank: a bi-encoder keeps only the top_k cars per top_k_pool
+        # cars of a batch and query (at least top_k), so larger batches keep the share
+        self.mode = mode
+        self.top_k = top_k
+        self.top_k_pool = top_k_pool
+        self.retriever = BiEncoder(retriever_model) if mode == "retrieve_rerank" else None
+        # drop pairs that violate hard constraints (mileage, power, year, fuel, colour)
+        self.prefilter = prefilter
+        # workers > 1 (CPU): micro-batches run in forked processes sharing the weights
+        self.scoring_pool = None
+        if workers > 1 and self.device.type == "cpu":
+            if can_fork():
+                self.scoring_pool = ScoringPool(self, workers, threads_per_worker)
+            else:
+                print("matcher.workers needs fork – scoring in this process")
+        forward = self.scoring_pool.forward if self.scoring_pool else self._forward
+        # max_wait_ms > 0: pairs of concurrent callers share forward passes
+        self.batcher = (
+            MicroBatcher(forward, inference_batch_size, max_wait_ms, length_bucket)
+            if max_wait_ms > 0
+            else None
+        )
+        # queries.json is re-read only when it changed; new queries are prepared once
+        # (recipients: addresses of the "default" user when users.json does not list it)
+        self.query_registry = QueryRegistry(
+            QUERIES_FILE, USERS_FILE, recipients, on_change=self._prepare_queries
+        )
 
     def _load_model(self, path: str):
         """Load the fine-tuned DeBERTa model and tokenizer."""
@@ -48,103 +229,266 @@ class CarMatcher:
         print("Model loaded successfully")
         return model, tokenizer
 
+    def _load_backend(self, path: str, backend: str, onnx_path: str | None, quantize: bool):
+        """``predict_proba`` backend for one model directory."""
+        if backend == "onnx":
+            return load_onnx_backend(path, onnx_path, quantize)
+        model, _ = self._load_model(path)
+        return TorchBackend(model.to(self.device), self.device)
+
     def _create_vehicle_description(self, car_json: dict) -> str:
-        """Create a comprehensive vehicle description from the car data.
-        This should match the format used during training."""
-        description_parts = []
-
-        # Add information dictionary details
-        if 'information_dict' in car_json:
-            info_dict = car_json['information_dict']
-            for key, value in info_dict.items():
-                description_parts.append(f"{key}: {value}")
+        return create_vehicle_description(car_json)
 
-        # Add details list
-        if 'details_list' in car_json:
-            details = " | ".join(car_json['details_list'])
-            description_parts.append(details)
+    # ------- batched scoring --------------------------------------------- #
 
-        # Add details text if available
-        if 'details_text' in car_json:
-            description_parts.append(car_json['details_text'])
+    def _forward(self, features: list[dict]) -> np.ndarray:
+        """Run one micro-batch, padded to its longest member, through the model."""
+        batch = self.tokenizer.pad(features, padding="longest", return_tensors="np")
+        with metrics.timer("model_forward_seconds"):
+            probs = self.backend.predict_proba(batch)
+        metrics.inc("pairs_scored_total", len(features))
+        return probs
 
-        # Fallback: if the structure is different, try to extract key info
-        if not description_parts:
-            # Handle alternative structure
-            if 'information' in car_json:
-                for key, value in car_json['information'].items():
-                    description_parts.append(f"{key}: {value}")
+    def _score_token_pairs(self, id_pairs: list[tuple[list[int], list[int]]]) -> np.ndarray:
+        """
+        Score pre-tokenized (query ids, vehicle ids) pairs.
+
+        Special tokens and truncation are added per pair, then the pairs are
+        sorted by length and fed to the model in micro-batches of
+        *inference_batch_size*, each padded only to its longest sequence
+        (through the shared MicroBatcher if one is set).
+        Scores are returned in input order.
+        """
+        scores = np.empty(len(id_pairs), dtype=np.float32)
+        budget = self.max_length - self.tokenizer.num_special_tokens_to_add(pair=True)
+        features = [
+            self.tokenizer.prepare_for_model(*_truncate_longest_first(q_ids, v_ids, budget))
+            for q_ids, v_ids in id_pairs
+        ]
+        if self.batcher is not None:
+            return self.batcher.submit(features).result()
+
+        # Similar lengths end up in the same micro-batch -> little padding
+        order = sorted(range(len(features)), key=lambda i: len(features[i]["input_ids"]))
+        chunks = [
+            order[start : start + self.inference_batch_size]
+            for start in range(0, len(order), self.inference_batch_size)
+        ]
+        if self.scoring_pool is not None:
+            probs = self.scoring_pool.map([[features[i] for i in idx] for idx in chunks])
+            for idx, p in zip(chunks, probs):
+                scores[idx] = p
+            return scores
+        for idx in chunks:
+            scores[idx] = self._forward([features[i] for i in idx])
+
+        return scores
+
+    def score_pairs(self, pairs: list[tuple[str, str]]) -> np.ndarray:
+        """Score (query, vehicle_text) pairs with the cross-encoder."""
+        q_ids = self.query_tokens.get_many([(q, q) for q, _ in pairs])
+        v_ids = self.vehicle_tokens.get_many([(content_hash(t), t) for _, t in pairs])
+        return self._score_token_pairs(list(zip(q_ids, v_ids)))
+
+    def score_matrix(
+        self,
+        queries: list[str],
+        cars: list[dict],
+        mask: np.ndarray | None = None,
+        query_hashes: list[str] | None = None,
+    ) -> np.ndarray:
+        """
+        Score every query against every car in one call.
 
-            if 'details' in car_json:
-                description_parts.append(car_json['details'])
+        Pairs already in the score cache are not run through the model again.
+        Each remaining query and car is tokenized at most once (see
+        *TokenCache*), the ids are combined per pair.
 
-        return " | ".join(description_parts)
+        :param queries: query strings (rows)
+        :param cars:    vehicle dicts (columns)
+        :param mask:    optional bool array (queries × cars); False pairs are skipped
+        :param query_hashes: ``content_hash`` of every query, if already known
+        :return:        float32 array (queries × cars), NaN where masked out
+        """
+        scores = np.full((len(queries), len(cars)), np.nan, dtype=np.float32)
+        if mask is None:
+            mask = np.ones(scores.shape, dtype=bool)
+        rows, cols = np.nonzero(mask)
+        if not len(rows):
+            return scores
+
+        # scores of unchanged (query, vehicle) pairs come from the cache
+        used_c = np.unique(cols).tolist()
+        texts = {c: self._create_vehicle_description(cars[c]) for c in used_c}
+        v_hash = {c: content_hash(t) for c, t in texts.items()}
+        q_hash = {
+            r: query_hashes[r] if query_hashes is not None else content_hash(queries[r])
+            for r in np.unique(rows).tolist()
+        }
+        pairs = list(zip(rows.tolist(), cols.tolist()))
+
+        if self.score_cache is not None:
+            cached = self.score_cache.get_many((q_hash[r], v_hash[c]) for r, c in pairs)
+            todo = []
+            for r, c in pairs:
+                score = cached.get((q_hash[r], v_hash[c]))
+                if score is None:
+                    todo.append((r, c))
+                else:
+                    scores[r, c] = score
+        else:
+            todo = pairs
+        if not todo:
+            return scores
+
+        # only the queries / cars that take part in at least one pair
+        used_q = sorted({r for r, _ in todo})
+        used_c = sorted({c for _, c in todo})
+        v_ids = dict(zip(used_c, self.vehicle_tokens.get_many(
+            [((cars[c].get("url"), v_hash[c]), texts[c]) for c in used_c]
+        )))
+        q_ids = dict(zip(used_q, self.query_tokens.get_many(
+            [(queries[r], queries[r]) for r in used_q]
+        )))
+
+        fresh = self._score_token_pairs([(q_ids[r], v_ids[c]) for r, c in todo])
+        t_rows, t_cols = zip(*todo)
+        scores[list(t_rows), list(t_cols)] = fresh
+
+        if self.score_cache is not None:
+            self.score_cache.put_many(
+                (q_hash[r], v_hash[c], s) for (r, c), s in zip(todo, fresh.tolist())
+            )
+        return scores
+
+    def close(self) -> None:
+        """Stop the scoring workers and the micro-batcher, if any."""
+        if self.batcher is not None:
+            self.batcher.close()
+        if self.scoring_pool is not None:
+            self.scoring_pool.close()
 
     def _predict(self, query: str, car_json: dict) -> float:
         """Return model score 0–1 for how well the query matches the car."""
-
-        # Create vehicle description in the same format as training
-        vehicle_text = self._create_vehicle_description(car_json)
-
-        # Tokenize the query-vehicle pair (cross-encoder format)
-        encoding = self.tokenizer(
-            query,
-            vehicle_text,
-            truncation=True,
-            padding='max_length',
-            max_length=self.max_length,
-            return_tensors='pt'
-        )
-
-        # Move to device
-        encoding = {k: v.to(self.device) for k, v in encoding.items()}
-
-        # Make prediction
-        with torch.no_grad():
-            outputs = self.model(**encoding)
-            # Get probability of positive class (index 1) - match probability
-            predictions = torch.nn.functional.softmax(outputs.logits, dim=-1)
-            match_probability = predictions[0][1].item()
-
-        return match_probability
+        return float(self.score_matrix([query], [car_json])[0, 0])
 
     def match(
         self,
         cars: Iterable[dict],
         batch_size: int = 10,
         threshold: float = 0.5,
-    ) -> List[Tuple[str, str]]:
+    ) -> List[Hit]:
         """
         Iterate over cars, score every batch of *batch_size* vehicles.
-        Returns the first ‑time hits; updates sent.json on the fly.
+        Returns the first ‑time hits; appends them to sent.ids on the fly.
         """
-        queries: list[dict[str, str]] = _load(QUERIES_FILE, [])
-        batch: list[dict] = []
-        hits: list[Tuple[str, str]] = []
-        for car in cars:
-            batch.append(car)
-
-            if len(batch) < batch_size:
-                continue
-
-            for car_json in batch:
-                url = car_json["url"]
-                if url in self.sent_cache:
-                    continue  # avoid duplicates
+        return list(self.match_stream(cars, batch_size, threshold))
 
-                for q in queries:
-                    if q['brand']:
-
-                        if not all([car_brand for car_brand in q['brand'].split() if car_brand in url]):
-                            continue # if car brands are selected, all must be present in the url
-
-                    if self._predict(q['query'], car_json) >= threshold:
-                        hits.append((url, q['query']))
-                        self.sent_cache.add(url)
-                        break  # no need to test other queries
-
-            batch.clear()
-
-        if hits:
-            _save(CACHE_FILE, sorted(self.sent_cache))
+    def match_stream(
+        self,
+        cars: Iterable[dict],
+        batch_size: int = 10,
+        threshold: float = 0.5,
+        max_wait_s: float | None = None,
+        queries: QuerySnapshot | None = None,
+    ) -> Iterator[Hit]:
+        """
+        Yield first‑time hits as soon as the batch holding the car is scored.
+
+        A batch is scored when it has *batch_size* cars, when *max_wait_s*
+        has passed since its first car arrived, or when *cars* ends. Hits are
+        appended to the users' sent files after every batch, so an
+        interrupted run does not mail them twice. Every batch is scored
+        against the current queries (see *QueryRegistry*), or against
+        *queries* if given (a fixed snapshot, e.g. the new queries of a
+        backfill; build it with version 0).
+        """
+        if queries is not None:
+            self._prepare_queries(queries)
+        for batch in iter_batches(cars, batch_size, max_wait_s):
+            snapshot = queries if queries is not None else self.load_queries()
+            with metrics.timer("match_batch_seconds"):
+                hits = self._match_batch(batch, snapshot, threshold)
+            if hits:
+                for cache in {hit.user: self._sent_for(hit.user) for hit in hits}.values():
+                    cache.flush()
+                yield from hits
+
+    def load_queries(self) -> QuerySnapshot:
+        return self.query_registry.snapshot()
+
+    def _prepare_queries(self, snapshot: QuerySnapshot) -> None:
+        """Tokenize / embed the added queries and forget the removed ones."""
+        self.query_tokens.discard(snapshot.removed)
+        if snapshot.added:
+            self.query_tokens.get_many([(q, q) for q in snapshot.added])
+        if self.retriever is not None and snapshot.texts:
+            # unchanged queries come from the bi-encoder's cache
+            snapshot.embeddings = self.retriever.embed(snapshot.texts)
+
+    def _sent_for(self, user: str) -> ItemIdSet:
+        if user == DEFAULT_USER:
+            return self.sent_cache
+        if user not in self.sent_caches:
+            path = sent_path(user, self.sent_cache.path) if self.sent_cache.path else None
+            self.sent_caches[user] = ItemIdSet(path)
+        return self.sent_caches[user]
+
+    @property
+    def seen_links(self):
+        """URLs every user with queries was already mailed (for skipping detail pages)."""
+        users = self.load_queries().store.user_names
+        if users in ([], [DEFAULT_USER]):
+            return self.sent_cache
+        return SentToAll(self._sent_for(user) for user in users)
+
+    def _match_batch(
+        self, batch: list[dict], snapshot: QuerySnapshot, threshold: float
+    ) -> List[Hit]:
+        """Score one batch against the queries that can apply to each car and collect the hits."""
+        store, queries = snapshot.store, snapshot.queries
+        # repeats within the batch are skipped
+        fresh: list[dict] = []
+        for car_json in batch:
+            if not any(c["url"] == car_json["url"] for c in fresh):
+                fresh.append(car_json)
+
+        # brand index: only the candidate queries of a car whose user was not mailed it yet
+        mask = np.zeros((len(queries), len(fresh)), dtype=bool)
+        for ci, car_json in enumerate(fresh):
+            url = car_json["url"]
+            for qi in store.candidates(url):
+                mask[qi, ci] = url not in self._sent_for(queries[qi]["user"])
+        # cars every user already got cost nothing further
+        keep = mask.any(axis=0)
+        fresh = [car for car, k in zip(fresh, keep) if k]
+        mask = mask[:, keep]
+        rows = np.flatnonzero(mask.any(axis=1))
+
+        if self.prefilter and len(rows):
+            columns = vehicle_columns(fresh)
+            for qi in rows:
+                mask[qi] &= constraint_row(snapshot.constraints[qi], columns)
+            rows = np.flatnonzero(mask.any(axis=1))
+
+        if self.retriever is not None and len(rows):
+            similarity = np.full(mask.shape, -np.inf, dtype=np.float32)
+            texts = [self._create_vehicle_description(car) for car in fresh]
+            similarity[rows] = snapshot.embeddings[rows] @ self.retriever.embed(texts).T
+            # rank only the cars the query may still apply to
+            similarity = np.where(mask, similarity, -np.inf)
+            k = max(self.top_k, math.ceil(self.top_k * len(fresh) / self.top_k_pool))
+            mask &= top_k_mask(similarity, k)
+
+        scores = self.score_matrix(snapshot.texts, fresh, mask, snapshot.hashes)
+
+        hits: list[Hit] = []
+        for ci, car_json in enumerate(fresh):
+            served: set[str] = set()
+            for qi in np.flatnonzero(mask[:, ci]):
+                user = queries[qi]["user"]
+                if user not in served and scores[qi, ci] >= threshold:
+                    hits.append(Hit(car_json["url"], queries[qi]['query'], user))
+                    self._sent_for(user).add(car_json["url"])
+                    served.add(user)  # first matching query of each user wins, as before
         return hits
@@ -0,0 +1,411 @@
+"""
+Resident matcher daemon (matcher.service_url).
+
+Loading transformers and the DeBERTa weights costs more than scoring a
+day's cars, so the model can stay warm in a long‑running process:
+
+    python matcher_service.py                 # host / port from matcher.service_url
+    python matcher_service.py --port 8765
+
+HTTP API (JSON bodies):
+
+* ``GET  /health``  – ``{"status": "ok", "queued": n, ...}``
+* ``GET  /metrics`` – Prometheus text of this process (see metrics.py)
+* ``POST /score``   – ``{"pairs": [[query, vehicle_text], ...]}`` → ``{"scores": [...]}``
+* ``POST /match``   – ``{"cars": [...], "batch_size": 10, "threshold": 0.5}``
+  → ``{"hits": [[url, query, user], ...]}`` (sent files, queries.json and
+  users.json as in ``CarMatcher.match``)
+
+``/match`` requests go through one queue served by the thread that owns
+the ``CarMatcher``. ``/score`` requests waiting at the same time share
+forward passes: in that queue, or, with ``matcher.max_wait_ms`` set, in the
+matcher's MicroBatcher, which also merges them with ``/match`` work. ``MatcherClient`` is a drop‑in for the parts of ``CarMatcher`` the
+job uses. It falls back to an in‑process matcher only while the service
+cannot be reached and tries the service again after ``retry_s``; other
+errors (HTTP 500, read timeouts) are raised, since a ``/match`` the service
+may still be committing must not be matched a second time locally.
+"""
+
+# standard library
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+# third party libraries
+import numpy as np
+import requests
+from urllib3.exceptions import NewConnectionError
+
+# project imports
+import metrics
+from batching import iter_batches
+from query_store import (
+    DEFAULT_USER,
+    QUERIES_FILE,
+    USERS_FILE,
+    Hit,
+    QueryStore,
+    SentToAll,
+    sent_path,
+)
+from url_set import ItemIdSet
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+SENT_FILE = Path("data/sent.ids")  # matcher.SENT_FILE, without importing torch here
+
+_logger = logging.getLogger("MatcherService")
+
+
+# ------------------------------------------------------------------ #
+#  Server
+# ------------------------------------------------------------------ #
+class _Job:
+    def __init__(self, kind: str, payload: dict):
+        self.kind = kind
+        self.payload = payload
+        self.queued = time.perf_counter()
+        self.future: Future = Future()
+
+
+class MatcherService:
+    """
+    Serialises all work on the matcher onto one worker thread.
+
+    :param matcher:   loaded CarMatcher (only ever used from the worker)
+    :param max_pairs: pairs of concurrent ``/score`` requests merged into one call
+    """
+
+    def __init__(self, matcher, max_pairs: int = 512):
+        self.matcher = matcher
+        self.max_pairs = max_pairs
+        self._jobs: queue.Queue[_Job] = queue.Queue()
+        self._worker = threading.Thread(target=self._work, name="matcher", daemon=True)
+        self._worker.start()
+
+    def call(self, kind: str, **payload):
+        """Queue a job and block until the worker has run it."""
+        if kind == "score" and self.matcher.batcher is not None:
+            # thread-safe: the matcher's MicroBatcher merges concurrent callers
+            return self._score_now(**payload)
+        job = _Job(kind, payload)
+        self._jobs.put(job)
+        return job.future.result()
+
+    @property
+    def queued(self) -> int:
+        return self._jobs.qsize()
+
+    def _work(self):
+        held: _Job | None = None
+        while True:
+            job, held = held or self._jobs.get(), None
+            jobs = [job]
+            if job.kind == "score":
+                # score requests that are already waiting ride along
+                pairs = len(job.payload["pairs"])
+                while pairs < self.max_pairs:
+                    try:
+                        nxt = self._jobs.get_nowait()
+                    except queue.Empty:
+                        break
+                    if nxt.kind != "score":
+                        held = nxt
+                        break
+                    jobs.append(nxt)
+                    pairs += len(nxt.payload["pairs"])
+
+            now = time.perf_counter()
+            for j in jobs:
+                metrics.observe("service_queue_wait_seconds", now - j.queued)
+            try:
+                with metrics.timer("service_job_seconds", kind=job.kind):
+                    if job.kind == "score":
+                        self._score(jobs)
+                    else:
+                        job.future.set_result(self._match(**job.payload))
+            except Exception as exc:
+                for j in jobs:
+                    if not j.future.done():
+                        j.future.set_exception(exc)
+
+    def _score(self, jobs: list[_Job]):
+        pairs = [tuple(p) for j in jobs for p in j.payload["pairs"]]
+        scores = self.matcher.score_pairs(pairs).tolist() if pairs else []
+        start = 0
+        for j in jobs:
+            end = start + len(j.payload["pairs"])
+            j.future.set_result(scores[start:end])
+            start = end
+
+    def _score_now(self, pairs: list[tuple[str, str]]) -> list[float]:
+        with metrics.timer("service_job_seconds", kind="score"):
+            return self.matcher.score_pairs(pairs).tolist() if pairs else []
+
+    def _match(self, cars: list[dict], batch_size: int = 10, threshold: float = 0.5):
+        return [list(hit) for hit in self.matcher.match(cars, batch_size, threshold)]
+
+
+def _handler(service: MatcherService, model: str):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, body: bytes, content_type="application/json"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _json(self, status: int, obj) -> None:
+            self._reply(status, json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._json(200, {"status": "ok", "model": model, "queued": service.queued})
+            elif self.path == "/metrics":
+                self._reply(200, metrics.REGISTRY.render().encode(), "text/plain; version=0.0.4")
+            else:
+                self._json(404, {"error": f"unknown path {self.path}"})
+
+        def do_POST(self):
+            endpoint = self.path.strip("/")
+            if endpoint not in ("score", "match"):
+                self._json(404, {"error": f"unknown path {self.path}"})
+                return
+            metrics.inc("service_requests_total", endpoint=endpoint)
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if endpoint == "score":
+                    payload = {"pairs": [(str(q), str(t)) for q, t in body["pairs"]]}
+                else:
+                    payload = {
+                        "cars": list(body["cars"]),
+                        "batch_size": int(body.get("batch_size", 10)),
+                        "threshold": float(body.get("threshold", 0.5)),
+                    }
+            except (KeyError, TypeError, ValueError) as exc:
+                self._json(400, {"error": f"bad request: {exc}"})
+                return
+            try:
+                result = service.call(endpoint, **payload)
+            except Exception as exc:
+                _logger.error("/%s failed: %s", endpoint, exc, exc_info=True)
+                self._json(500, {"error": str(exc)})
+                return
+            self._json(200, {"scores" if endpoint == "score" else "hits": result})
+
+        def log_message(self, fmt, *args):
+            _logger.debug(fmt, *args)
+
+    return Handler
+
+
+def serve(matcher, host: str, port: int, model: str = "") -> ThreadingHTTPServer:
+    service = MatcherService(matcher)
+    return ThreadingHTTPServer((host, port), _handler(service, model))
+
+
+# ------------------------------------------------------------------ #
+#  Client
+# ------------------------------------------------------------------ #
+def _unreachable(exc: requests.ConnectionError) -> bool:
+    """True if the request never got to the service (refused, or connect timeout)."""
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return isinstance(exc, requests.ConnectTimeout) or isinstance(reason, NewConnectionError)
+
+
+class MatcherClient:
+    """
+    ``match`` / ``score_pairs`` of a running service, with a local fallback.
+
+    :param url:      service base URL
+    :param fallback: builds an in‑process CarMatcher, used while the service
+                     cannot be reached (``None`` = raise)
+    :param timeout:  seconds per request (a cold cache can take a while)
+    :param retry_s:  seconds on the local matcher before the service is tried again
+    """
+
+    def __init__(
+        self,
+        url: str,
+        fallback: Callable | None = None,
+        timeout: float = 600.0,
+        retry_s: float = 60.0,
+    ):
+        self.url = url.rstrip("/")
+        self.fallback = fallback
+        self.timeout = timeout
+        self.retry_s = retry_s
+        self.session = requests.Session()
+        self._local = None
+        self._down = False
+        self._retry_at = 0.0  # time.monotonic() of the next try while the service is down
+        self._sent: dict[str, ItemIdSet] = {}
+
+    def _sent_for(self, user: str) -> ItemIdSet:
+        """Read‑only view for skipping links; the service owns and writes the sent files."""
+        if user not in self._sent:
+            self._sent[user] = ItemIdSet(sent_path(user, SENT_FILE))
+        return self._sent[user]
+
+    @property
+    def sent_cache(self) -> ItemIdSet:
+        return self._sent_for(DEFAULT_USER)
+
+    @property
+    def seen_links(self):
+        """Like ``CarMatcher.seen_links``: URLs every user was already mailed."""
+        users = []
+        if QUERIES_FILE.exists():
+            users = QueryStore.load(QUERIES_FILE, USERS_FILE).user_names
+        if users in ([], [DEFAULT_USER]):
+            return self.sent_cache
+        return SentToAll(self._sent_for(user) for user in users)
+
+    def _post(self, endpoint: str, body: dict) -> dict:
+        resp = self.session.post(f"{self.url}/{endpoint}", json=body, timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json()
+
+    def _use_service(self) -> bool:
+        return not self._down or time.monotonic() >= self._retry_at
+
+    def _fall_back(self, exc: requests.ConnectionError):
+        """Local matcher for the next *retry_s* seconds (connection errors only)."""
+        if self.fallback is None:
+            raise exc
+        self._down = True
+        self._retry_at = time.monotonic() + self.retry_s
+        _logger.warning(
+            "Matcher service unavailable (%s) – local model, retry in %.0fs", exc, self.retry_s
+        )
+        if self._local is None:
+            self._local = self.fallback()
+        else:
+            # the service may have added to the sent files in the meantime
+            self._local.sent_cache = ItemIdSet(self._local.sent_cache.path)
+            self._local.sent_caches = {}
+        return self._local
+
+    def _reached(self) -> None:
+        if self._down:
+            _logger.info("Matcher service at %s is back", self.url)
+            self._down = False
+
+    def health(self) -> dict:
+        resp = self.session.get(f"{self.url}/health", timeout=5)
+        resp.raise_for_status()
+        return resp.json()
+
+    def score_pairs(self, pairs: list[tuple[str, str]]) -> np.ndarray:
+        if self._use_service():
+            try:
+                scores = self._post("score", {"pairs": [list(p) for p in pairs]})["scores"]
+            except requests.ConnectionError as exc:
+                self._fall_back(exc)  # scoring has no side effects: safe to repeat
+            else:
+                self._reached()
+                return np.asarray(scores, dtype=np.float32)
+        return self._local.score_pairs(pairs)
+
+    def match_stream(
+        self,
+        cars: Iterable[dict],
+        batch_size: int = 10,
+        threshold: float = 0.5,
+        max_wait_s: float | None = None,
+    ) -> Iterator[Hit]:
+        """Like ``CarMatcher.match_stream``; every batch is one ``/match`` call."""
+        for batch in iter_batches(cars, batch_size, max_wait_s):
+            yield from self.match(batch, batch_size, threshold)
+
+    def match(
+        self, cars: Iterable[dict], batch_size: int = 10, threshold: float = 0.5
+    ) -> list[Hit]:
+        cars = list(cars)
+        if self._use_service():
+            body = {"cars": cars, "batch_size": batch_size, "threshold": threshold}
+            try:
+                hits = [Hit(*hit) for hit in self._post("match", body)["hits"]]
+            except requests.ConnectionError as exc:
+                if not _unreachable(exc):
+                    # sent, then the connection broke: the service may record these hits
+                    _logger.error("Matcher service dropped /match (%s) – batch not re-matched", exc)
+                    raise
+                self._fall_back(exc)
+            except requests.Timeout:
+                _logger.error("Matcher service timed out on /match – batch not re-matched locally")
+                raise
+            else:
+                self._reached()
+                for hit in hits:
+                    self._sent_for(hit.user).add(hit.url)
+                return hits
+        hits = self._local.match(cars, batch_size, threshold)
+        for hit in hits:
+            self._sent_for(hit.user).add(hit.url)
+        return hits
+
+    def close(self) -> None:
+        """Close the HTTP session and the local fallback matcher, if one was loaded."""
+        if self._local is not None:
+            self._local.close()
+        self.session.close()
+
+
+def connect(url: str, fallback: Callable | None = None, logger: logging.Logger = _logger):
+    """
+    A ``MatcherClient`` if the service at *url* answers, else ``fallback()``.
+    """
+    client = MatcherClient(url, fallback)
+    try:
+        info = client.health()
+    except requests.RequestException as exc:
+        if fallback is None:
+            raise
+        logger.warning("Matcher service at %s not reachable (%s) – using local model", url, exc)
+        return fallback()
+    logger.info("Using matcher service at %s (%s)", url, info.get("model", "?"))
+    return client
+
+
+def main():
+    # project imports
+    from orchestrator import MATCHER_SERVICE_URL, MODEL_PATH, build_matcher
+
+    default = urlsplit(MATCHER_SERVICE_URL or DEFAULT_URL)
+    p = argparse.ArgumentParser(description="Resident car matcher service")
+    p.add_argument("--host", default=default.hostname)
+    p.add_argument("--port", type=int, default=default.port)
+    args = p.parse_args()
+
+    start = time.perf_counter()
+    matcher = build_matcher()
+    _logger.info("Model loaded in %.1fs", time.perf_counter() - start)
+
+    server = serve(matcher, args.host, args.port, str(MODEL_PATH))
+    _logger.info("Matcher service on http://%s:%d", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        matcher.close()
+
+
+if __name__ == "__main__":
+    handler = logging.StreamHandler()
+    handler.setFormatter(
+        logging.Formatter("[MatcherService]: %(asctime)s  %(levelname)s  %(message)s", "%H:%M:%S")
+    )
+    _logger.addHandler(handler)
+    _logger.setLevel(logging.INFO)
+    main()
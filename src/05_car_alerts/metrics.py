@@ -0,0 +1,241 @@
+"""
+Process‑wide counters, gauges and timing histograms (config section ``metrics``).
+
+Instrumented code only calls :func:`inc`, :func:`set_gauge`,
+:func:`observe` or the :func:`timer` context manager; the job exports the
+registry at the end of a run:
+
+* ``metrics.textfile`` – Prometheus text format (node_exporter textfile
+  collector), rewritten atomically after every run
+* ``metrics.port``     – ``GET /metrics`` on localhost while the process runs
+* ``metrics.summary_dir`` – one ``run_<timestamp>.json`` per job with count,
+  total and p50 / p95 / max seconds of every timer
+
+Names are exported with the ``car_alerts_`` prefix; timers are histograms in
+seconds. Work done in the ParsePool processes is timed there and reported
+back with the result, and ScoringPool workers hand back their counters with
+every micro‑batch, so the parent registry holds everything.
+"""
+
+# standard library
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+PREFIX = "car_alerts_"
+# seconds; covers a tokenizer call (~ms) up to a Chrome page load with delays (~s)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float("inf"))
+
+_logger = logging.getLogger("Orchestrator")
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _label_str(labels: tuple) -> str:
+    if not labels:
+        return ""
+    def escape(v: str) -> str:
+        return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels) + "}"
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate from the buckets (linear inside a bucket, like ``histogram_quantile``)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lo = BUCKETS[i - 1] if i else 0.0
+                hi = min(BUCKETS[i], self.max)
+                return lo + (hi - lo) * (rank - seen) / n
+            seen += n
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "total_s": self.sum,
+            "mean_s": self.sum / self.count if self.count else 0.0,
+            "p50_s": self.quantile(0.5),
+            "p95_s": self.quantile(0.95),
+            "max_s": self.max,
+        }
+
+
+class Registry:
+    """Thread‑safe store of every metric of this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started = time.time()
+            self._counters: dict[tuple, float] = {}
+            self._gauges: dict[tuple, float] = {}
+            self._histograms: dict[tuple, _Histogram] = {}
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = _Histogram()
+            hist.observe(seconds)
+
+    def take_counters(self) -> dict[tuple, float]:
+        """Counters incremented since the last call (cleared); for worker processes."""
+        with self._lock:
+            counters, self._counters = self._counters, {}
+        return counters
+
+    def add_counters(self, counters: dict[tuple, float]) -> None:
+        """Add counters taken in another process."""
+        with self._lock:
+            for key, value in counters.items():
+                self._counters[key] = self._counters.get(key, 0) + value
+
+    # ------------------------------------------------------------------ #
+    #  Export
+    # ------------------------------------------------------------------ #
+    def render(self) -> str:
+        """Everything in Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for kind, metrics in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted({n for n, _ in metrics}):
+                    lines.append(f"# TYPE {PREFIX}{name} {kind}")
+                    for (n, labels), value in sorted(metrics.items()):
+                        if n == name:
+                            lines.append(f"{PREFIX}{name}{_label_str(labels)} {value:g}")
+            for name in sorted({n for n, _ in self._histograms}):
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for (n, labels), hist in sorted(self._histograms.items()):
+                    if n != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS, hist.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        bucket_labels = _label_str(labels + (("le", le),))
+                        lines.append(f"{PREFIX}{name}_bucket{bucket_labels} {cumulative}")
+                    lines.append(f"{PREFIX}{name}_sum{_label_str(labels)} {hist.sum:.6f}")
+                    lines.append(f"{PREFIX}{name}_count{_label_str(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        """Plain dict of the current values (``name{label=value}`` keys)."""
+
+        def key(name, labels):
+            return name + _label_str(labels).replace('"', "")
+
+        with self._lock:
+            return {
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "elapsed_s": time.time() - self.started,
+                "counters": {key(*k): v for k, v in sorted(self._counters.items())},
+                "gauges": {key(*k): v for k, v in sorted(self._gauges.items())},
+                "timers": {key(*k): h.summary() for k, h in sorted(self._histograms.items())},
+            }
+
+
+REGISTRY = Registry()
+inc = REGISTRY.inc
+set_gauge = REGISTRY.set_gauge
+observe = REGISTRY.observe
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """Observe the wall time of the ``with`` block (also when it raises)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe(name, time.perf_counter() - start, **labels)
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f"{path.suffix}.{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def write_textfile(path: str | Path) -> None:
+    _write_atomic(Path(path), REGISTRY.render())
+
+
+def write_summary(summary_dir: str | Path, **extra) -> Path:
+    """Write ``run_<start time>.json`` with the snapshot plus *extra* fields."""
+    report = {**REGISTRY.snapshot(), **extra}
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.localtime(REGISTRY.started))
+    path = Path(summary_dir) / f"run_{stamp}.json"
+    _write_atomic(path, json.dumps(report, indent=2))
+    return path
+
+
+# ------------------------------------------------------------------ #
+#  HTTP endpoint
+# ------------------------------------------------------------------ #
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_server: ThreadingHTTPServer | None = None
+
+
+def serve(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve ``/metrics`` from a daemon thread (once per process)."""
+    global _server
+    if _server is None:
+        _server = ThreadingHTTPServer((host, port), _Handler)
+        threading.Thread(target=_server.serve_forever, daemon=True).start()
+        _logger.info("Metrics on http://%s:%d/metrics", host, port)
+    return _server
@@ -0,0 +1,244 @@
+"""
+ONNX Runtime backend for the matcher (matcher.backend: onnx).
+
+The fine‑tuned model at ``matcher.model_path`` is exported once to ONNX,
+optionally with dynamic int8 weight quantisation, and then served by ONNX
+Runtime on the CPU with the same ``predict_proba`` interface as the PyTorch
+backend.
+
+Run with terminal from root directory 05_car_alerts:
+
+    python onnx_backend.py export --quantize
+    python onnx_backend.py check --pairs 500
+"""
+
+# standard library
+import argparse
+import logging
+import os
+import random
+import time
+from pathlib import Path
+
+# third party libraries
+import numpy as np
+import yaml
+
+CONFIG_FILE = Path(__file__).parent / "config" / "orchestrator.yaml"
+
+_logger = logging.getLogger("Orchestrator")
+
+
+def default_onnx_path(model_path: str | Path, quantize: bool) -> Path:
+    """``<model_path>/onnx/model.onnx`` (or ``model.int8.onnx``)."""
+    return Path(model_path) / "onnx" / ("model.int8.onnx" if quantize else "model.onnx")
+
+
+def export_onnx(model_path: str | Path, out_path: str | Path, quantize: bool = False) -> Path:
+    """
+    Export the sequence‑classification model to ONNX with dynamic batch / sequence axes.
+
+    :param model_path: directory of the fine‑tuned model (as used by CarMatcher)
+    :param out_path:   target ``.onnx`` file
+    :param quantize:   apply dynamic int8 quantisation to the exported graph
+    :return:           path of the written model
+    """
+    # third party libraries
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    fp32_path = out_path.with_name("model.onnx") if quantize else out_path
+
+    if not fp32_path.exists():
+        tokenizer = AutoTokenizer.from_pretrained(model_path)
+        model = AutoModelForSequenceClassification.from_pretrained(model_path)
+        model.eval()
+        model.config.return_dict = False
+
+        dummy = tokenizer("query", "vehicle description", return_tensors="pt")
+        names = [n for n in tokenizer.model_input_names if n in dummy]
+        axes = {n: {0: "batch", 1: "sequence"} for n in names}
+        axes["logits"] = {0: "batch"}
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(dummy[n] for n in names),
+                str(fp32_path),
+                input_names=names,
+                output_names=["logits"],
+                dynamic_axes=axes,
+                opset_version=17,
+                do_constant_folding=True,
+            )
+
+    if quantize:
+        # third party libraries
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(str(fp32_path), str(out_path), weight_type=QuantType.QInt8)
+    return out_path
+
+
+class OnnxBackend:
+    """
+    CPU inference session over an exported model.
+
+    :param onnx_path: ``.onnx`` file from :func:`export_onnx`
+    :param threads:   intra‑op threads (``None`` = ONNX Runtime default)
+    """
+
+    def __init__(self, onnx_path: str | Path, threads: int | None = None):
+        try:
+            # third party libraries
+            import onnxruntime as ort
+        except ImportError as exc:
+            raise ImportError(
+                "matcher.backend 'onnx' needs onnxruntime: pip install onnxruntime"
+            ) from exc
+
+        self.onnx_path = Path(onnx_path)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            str(onnx_path), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def predict_proba(self, batch: dict[str, np.ndarray]) -> np.ndarray:
+        feed = {n: np.asarray(batch[n], dtype=np.int64) for n in self.input_names}
+        logits = self.session.run(["logits"], feed)[0].astype(np.float32)
+        # Probability of the positive class (index 1) - match probability
+        logits -= logits.max(axis=-1, keepdims=True)
+        probs = np.exp(logits)
+        return probs[:, 1] / probs.sum(axis=-1)
+
+    def for_worker(self, threads: int) -> "OnnxBackend":
+        """A fresh session for a forked scoring worker (thread pools do not survive a fork)."""
+        return OnnxBackend(self.onnx_path, threads)
+
+
+def load_onnx_backend(
+    model_path: str | Path,
+    onnx_path: str | Path | None = None,
+    quantize: bool = True,
+    threads: int | None = None,
+) -> OnnxBackend:
+    """Open the ONNX model for *model_path*, exporting it first if it is missing."""
+    path = Path(onnx_path) if onnx_path else default_onnx_path(model_path, quantize)
+    if not path.exists():
+        print(f"Exporting {model_path} → {path} (quantize={quantize})")
+        export_onnx(model_path, path, quantize)
+    return OnnxBackend(path, threads)
+
+
+# ------------------------------------------------------------------ #
+#  Parity / throughput check
+# ------------------------------------------------------------------ #
+def _held_out_pairs(limit: int, seed: int = 42) -> list[tuple[str, str]]:
+    """Seeded sample of the test split of the training notebooks, else of the full labelled set."""
+    # project imports
+    from retrieval_recall import REPO_DATA, load_labelled_pairs
+
+    questions = REPO_DATA / "test_generated_questions.json"
+    vehicles = REPO_DATA / "test_vehicles_info.yaml"
+    if not (questions.exists() and vehicles.exists()):
+        _logger.warning("No held-out split (%s) – comparing on the training data", questions.name)
+        questions = REPO_DATA / "generated_questions.json"
+        vehicles = REPO_DATA / "vehicles_info.yaml"
+    print(f"Pairs from {questions.name}")
+    _, texts, pairs = load_labelled_pairs(questions, vehicles)
+    sample = random.Random(seed).sample(pairs, min(limit, len(pairs)))
+    return [(q, texts[idx]) for q, idx, _ in sample]
+
+
+def _timed_scores(matcher, pairs) -> tuple[np.ndarray, float]:
+    matcher.vehicle_tokens.clear()
+    matcher.query_tokens.clear()
+    start = time.perf_counter()
+    scores = matcher.score_pairs(pairs)
+    return scores, len(pairs) / (time.perf_counter() - start)
+
+
+def check(
+    model_path: str, n_pairs: int, threshold: float, batch_size: int, seed: int = 42
+) -> dict:
+    """Compare ONNX (fp32 and int8) scores with PyTorch on held‑out pairs."""
+    # project imports
+    from matcher import CarMatcher
+
+    pairs = _held_out_pairs(n_pairs, seed)
+    report = {"pairs": len(pairs), "threshold": threshold}
+
+    # score_cache / sent_file None: a parity check writes nothing to data/
+    reference = CarMatcher(
+        model_path, inference_batch_size=batch_size, score_cache=None, sent_file=None
+    )
+    ref_scores, report["torch_pairs_per_s"] = _timed_scores(reference, pairs)
+
+    for quantize in (False, True):
+        name = "onnx_int8" if quantize else "onnx_fp32"
+        candidate = CarMatcher(
+            model_path,
+            inference_batch_size=batch_size,
+            score_cache=None,
+            sent_file=None,
+            backend="onnx",
+            onnx_quantize=quantize,
+        )
+        scores, throughput = _timed_scores(candidate, pairs)
+        diff = np.abs(scores - ref_scores)
+        report[name] = {
+            "pairs_per_s": throughput,
+            "speedup": throughput / report["torch_pairs_per_s"],
+            "max_abs_diff": float(diff.max()) if len(diff) else 0.0,
+            "mean_abs_diff": float(diff.mean()) if len(diff) else 0.0,
+            "decision_agreement": float(
+                ((scores >= threshold) == (ref_scores >= threshold)).mean()
+            ),
+        }
+    return report
+
+
+def main():
+    p = argparse.ArgumentParser(description="ONNX export and parity check for CarMatcher")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    config = yaml.safe_load(CONFIG_FILE.read_text())
+    model_path = config["matcher"]["model_path"]
+
+    exp = sub.add_parser("export", help="export matcher.model_path to ONNX")
+    exp.add_argument("--model", default=model_path)
+    exp.add_argument("--out", type=Path)
+    exp.add_argument("--quantize", action="store_true", help="dynamic int8 weights")
+
+    chk = sub.add_parser("check", help="parity + pairs/s against PyTorch")
+    chk.add_argument("--model", default=model_path)
+    chk.add_argument("--pairs", type=int, default=500)
+    chk.add_argument("--threshold", type=float, default=config["matcher"]["threshold"])
+    chk.add_argument("--batch-size", type=int, default=32)
+    chk.add_argument("--seed", type=int, default=42, help="sample of held-out pairs")
+    args = p.parse_args()
+
+    if args.cmd == "export":
+        out = args.out or default_onnx_path(args.model, args.quantize)
+        print(f"Written {export_onnx(args.model, out, args.quantize)}")
+        return
+
+    report = check(args.model, args.pairs, args.threshold, args.batch_size, args.seed)
+    print(f"{report['pairs']} pairs, torch: {report['torch_pairs_per_s']:.1f} pairs/s")
+    for name in ("onnx_fp32", "onnx_int8"):
+        r = report[name]
+        print(
+            f"  {name:<9} {r['pairs_per_s']:.1f} pairs/s (×{r['speedup']:.2f})"
+            f"  max|Δ|={r['max_abs_diff']:.4f}  mean|Δ|={r['mean_abs_diff']:.4f}"
+            f"  agreement@{args.threshold}={r['decision_agreement']:.3%}"
+        )
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    main()
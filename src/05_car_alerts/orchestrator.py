@@ -3,17 +3,34 @@ orchestrator.py – batch‑stream version
 """
 
 # standard library
+import argparse
+import asyncio
 import logging
 import os
+import tempfile
+import time
 from pathlib import Path
 
 # third party libraries
 import yaml
 
 # project imports
+import metrics
+from batching import iter_batches
+from crawl_index import CrawlIndex
+from driver_pool import DriverPool, RateLimiter
 from email_util import send_car_email
+from http_fetcher import HttpFetcher
 from matcher import CarMatcher
+from matcher_service import connect as connect_matcher
+from parse_pool import ParsePool
+from pipeline import Pipeline
+from query_registry import QueryRegistry
+from query_store import group_hits
 from scraper import ArticleLinkParser
+from snapshot_store import ReplayParser, SnapshotStore
+from url_set import ItemIdSet
+from vehicle_store import VehicleStore
 
 # ── CONFIG ────────────────────────────────────────────────────────── #
 CONFIG = yaml.safe_load(
@@ -31,23 +48,64 @@ SMTP_PASSWD = CONFIG["smtp"]["password"]
 BASE_URL = CONFIG["scraper"]["base_url"]
 MAX_PAGES = CONFIG["scraper"]["max_pages"]
 BATCH_SIZE = CONFIG["scraper"]["batch_size"]
+BATCH_WAIT_S = CONFIG["scraper"].get("batch_wait_s") or None
+WORKERS = CONFIG["scraper"].get("workers", 1)
+REQUESTS_PER_MINUTE = CONFIG["scraper"].get("requests_per_minute", 0)
+HTTP_FIRST = CONFIG["scraper"].get("http_first", False)
+PIPELINE = CONFIG["scraper"].get("pipeline", False)
+QUEUE_SIZE = CONFIG["scraper"].get("queue_size", 20)
+PARSE_WORKERS = CONFIG["scraper"].get("parse_workers", 2)
+INCREMENTAL = CONFIG["scraper"].get("incremental", False)
+CRAWL_INDEX = CONFIG["scraper"].get("crawl_index", "data/crawl.sqlite")
+REVISIT_TTL_HOURS = CONFIG["scraper"].get("revisit_ttl_hours", 0)
+STOP_ON_KNOWN_PAGE = CONFIG["scraper"].get("stop_on_known_page", False)
+EXTRACTOR = CONFIG["scraper"].get("extractor", "soup")
+RAW_HTML_DIR = CONFIG["scraper"].get("raw_html_dir") or None
+SNAPSHOT_DIR = CONFIG["scraper"].get("snapshot_dir") or None
+
+# Storage
+STORAGE_FORMAT = CONFIG.get("storage", {}).get("format", "yaml")
 
 # Matcher
 THRESHOLD = CONFIG["matcher"]["threshold"]
 MODEL_PATH = CONFIG["matcher"]["model_path"]
+INFERENCE_BATCH_SIZE = CONFIG["matcher"].get("inference_batch_size", 32)
+SCORE_CACHE = CONFIG["matcher"].get("score_cache") or None
+MATCHER_MODE = CONFIG["matcher"].get("mode", "cross_encoder")
+RETRIEVER_MODEL = CONFIG["matcher"].get(
+    "retriever_model", "sentence-transformers/all-MiniLM-L6-v2"
+)
+TOP_K = CONFIG["matcher"].get("top_k", 3)
+TOP_K_POOL = CONFIG["matcher"].get("top_k_pool", 10)
+PREFILTER = CONFIG["matcher"].get("prefilter", False)
+BACKEND = CONFIG["matcher"].get("backend", "torch")
+ONNX_QUANTIZE = CONFIG["matcher"].get("onnx_quantize", True)
+MAX_WAIT_MS = CONFIG["matcher"].get("max_wait_ms", 0)
+LENGTH_BUCKET = CONFIG["matcher"].get("length_bucket", 32)
+SCORING_WORKERS = CONFIG["matcher"].get("workers", 1)
+THREADS_PER_WORKER = CONFIG["matcher"].get("threads_per_worker", 0)
+ENSEMBLE = CONFIG["matcher"].get("ensemble", False)
+ENSEMBLE_MIN_FOLDS = CONFIG["matcher"].get("ensemble_min_folds", 2)
+ENSEMBLE_MARGIN = CONFIG["matcher"].get("ensemble_margin", 0.35)
+MATCHER_SERVICE_URL = CONFIG["matcher"].get("service_url") or None
+
+# Metrics
+METRICS_TEXTFILE = CONFIG.get("metrics", {}).get("textfile") or None
+METRICS_PORT = CONFIG.get("metrics", {}).get("port", 0)
+RUN_SUMMARY_DIR = CONFIG.get("metrics", {}).get("summary_dir") or None
 # ------------------------------------------------------------------- #
 
 DATA_DIR = Path(__file__).resolve().parent / "data"
 DATA_DIR.mkdir(exist_ok=True)
 
 
-def _save_batch_to_yaml(batch: list[dict], logger):
+def _save_batch_to_yaml(batch: list[dict], logger, data_dir: Path = DATA_DIR):
     """
     Append *batch* to the current YAML file, skipping URLs that
     already exist; start a new file after 3000 entries.
     """
     # discover latest file
-    files = sorted(DATA_DIR.glob("vehicles_data_*.yaml"))
+    files = sorted(data_dir.glob("vehicles_data_*.yaml"))
     if files:
         current = files[-1]
         with current.open("r", encoding="utf-8") as fh:
@@ -56,7 +114,7 @@ def _save_batch_to_yaml(batch: list[dict], logger):
             except yaml.YAMLError:
                 existing = {}
     else:
-        current = DATA_DIR / "vehicles_data_1.yaml"
+        current = data_dir / "vehicles_data_1.yaml"
         existing = {}
 
     # quick look‑up of URLs already saved
@@ -78,7 +136,7 @@ def _save_batch_to_yaml(batch: list[dict], logger):
             logger.info("Saved 3000 rows → %s", current.name)
             # start fresh
             idx = int(current.stem.split("_")[-1]) + 1
-            current = DATA_DIR / f"vehicles_data_{idx}.yaml"
+            current = data_dir / f"vehicles_data_{idx}.yaml"
             existing = {}
             seen_urls.clear()
 
@@ -89,19 +147,83 @@ def _save_batch_to_yaml(batch: list[dict], logger):
         logger.info("Appended %d new rows → %s", added, current.name)
 
 
-def parse_vehicle(parser: ArticleLinkParser, url: str) -> dict:
-    soup = parser.get_vehicle_soup(url)
-    info = parser.parse_table_after_header(soup, "Information")
-    details, text = parser.parse_vehicle_details(soup)
-    return {
-        "url": url,
-        "information": {k.rstrip(":"): v for k, v in info},
-        "details_list": details,
-        "details_text": text,
-    }
+def _archived_urls(store: VehicleStore | None):
+    """URLs already in the archive (jsonl store, else the YAML files)."""
+    if store is not None:
+        return [car["url"] for car in store.iter_cars()]
+    urls = []
+    for path in DATA_DIR.glob("vehicles_data_*.yaml"):
+        with path.open("r", encoding="utf-8") as fh:
+            urls.extend((yaml.safe_load(fh) or {}).keys())
+    return urls
+
+
+def fetch_page(parser: ArticleLinkParser, url: str) -> tuple[str, str]:
+    """Load one vehicle page; parsing happens in the ParsePool."""
+    return url, parser.get_vehicle_html(url)
+
+
+def build_matcher(workers: int | None = None) -> CarMatcher:
+    """
+    CarMatcher configured from the ``matcher`` section.
+
+    :param workers: scoring processes instead of ``matcher.workers``
+    """
+    return CarMatcher(
+        str(MODEL_PATH),
+        inference_batch_size=INFERENCE_BATCH_SIZE,
+        score_cache=SCORE_CACHE and Path(SCORE_CACHE),
+        mode=MATCHER_MODE,
+        retriever_model=RETRIEVER_MODEL,
+        top_k=TOP_K,
+        top_k_pool=TOP_K_POOL,
+        prefilter=PREFILTER,
+        backend=BACKEND,
+        onnx_quantize=ONNX_QUANTIZE,
+        max_wait_ms=MAX_WAIT_MS,
+        length_bucket=LENGTH_BUCKET,
+        ensemble=ENSEMBLE,
+        ensemble_threshold=THRESHOLD,
+        ensemble_min_folds=ENSEMBLE_MIN_FOLDS,
+        ensemble_margin=ENSEMBLE_MARGIN,
+        workers=SCORING_WORKERS if workers is None else workers,
+        threads_per_worker=THREADS_PER_WORKER,
+        recipients=SEND_TO,
+    )
+
+
+def _export_metrics(logger, **extra):
+    """Log where the run spent its time and write the configured metric outputs."""
+    metrics.set_gauge("last_run_seconds", time.time() - metrics.REGISTRY.started)
+    metrics.set_gauge("last_run_timestamp_seconds", time.time())
+    timers = metrics.REGISTRY.snapshot()["timers"]
+    for name, t in sorted(timers.items(), key=lambda kv: -kv[1]["total_s"]):
+        logger.info(
+            "  ⏱ %-40s %8.1fs  n=%-6d p50=%.3fs p95=%.3fs",
+            name,
+            t["total_s"],
+            t["count"],
+            t["p50_s"],
+            t["p95_s"],
+        )
+    try:
+        if METRICS_TEXTFILE:
+            metrics.write_textfile(METRICS_TEXTFILE)
+        if RUN_SUMMARY_DIR:
+            path = metrics.write_summary(RUN_SUMMARY_DIR, **extra)
+            logger.info("Run summary → %s", path)
+    except OSError as exc:
+        logger.error("Writing metrics failed: %s", exc)
+
 
+def run_daily_job(replay: str | None = None):
+    """
+    Scrape, archive and match one day's listings.
 
-def run_daily_job():
+    :param replay: run id from the snapshot store (``"latest"`` for the last
+                   one) to replay offline instead of crawling; nothing is
+                   written to the archive, the sent cache or the crawl index
+    """
     logger = logging.getLogger("Orchestrator")
     if not logger.handlers:
         sh = logging.StreamHandler()
@@ -113,62 +235,209 @@ def run_daily_job():
         logger.addHandler(sh)
         logger.setLevel(logging.INFO)
 
-    logger.info("▶ Starting daily scrape & match job")
+    logger.info("▶ Starting daily %s job", "replay" if replay else "scrape & match")
+    metrics.REGISTRY.reset()  # counters and timers cover this run only
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
 
-    parser = ArticleLinkParser(
-        headless=CONFIG["scraper"]["headless"],
-        delay_range=tuple(CONFIG["scraper"]["delay"]),
-    )
-    matcher = CarMatcher(str(MODEL_PATH))
+    snapshots = SnapshotStore(SNAPSHOT_DIR) if SNAPSHOT_DIR else None
+    if replay:
+        # recorded pages instead of Chrome; results go to a throw-away archive
+        snapshots = snapshots or SnapshotStore()
+        run = None if replay == "latest" else replay
+        limiter = http = None
+        replay_dir = tempfile.TemporaryDirectory(prefix="car_alerts_replay_")
+        data_dir = Path(replay_dir.name)
+        parser = ReplayParser(snapshots, run)
+        factory = lambda: ReplayParser(snapshots, run)
+    else:
+        # one politeness budget for the whole crawl, shared by every driver
+        requests_per_minute = REQUESTS_PER_MINUTE
+        if not requests_per_minute and WORKERS > 1:
+            # no budget set: all drivers together keep the pace of one driver's delay
+            delay = CONFIG["scraper"]["delay"]
+            requests_per_minute = 60 / (sum(delay) / len(delay))
+            logger.info(
+                "%d drivers share %.0f requests/min (from scraper.delay)",
+                WORKERS, requests_per_minute,
+            )
+        limiter = RateLimiter(requests_per_minute) if requests_per_minute else None
+        # plain HTTP for detail pages, Chrome only when the static HTML is incomplete
+        http = (
+            HttpFetcher(
+                pool_size=max(WORKERS, 1),
+                delay_range=tuple(CONFIG["scraper"]["delay"]),
+                rate_limiter=limiter,
+            )
+            if HTTP_FIRST
+            else None
+        )
+        replay_dir = None
+        data_dir = DATA_DIR
+        parser = ArticleLinkParser(
+            headless=CONFIG["scraper"]["headless"],
+            delay_range=tuple(CONFIG["scraper"]["delay"]),
+            rate_limiter=limiter,
+            http_fetcher=http,
+            snapshots=snapshots,
+        )
+        factory = None
+    pool = None
+    # page sources are parsed in worker processes while the browser moves on
+    parse_pool = ParsePool(PARSE_WORKERS, extractor=EXTRACTOR, raw_html_dir=RAW_HTML_DIR)
+    if replay:
+        matcher = build_matcher()
+        matcher.sent_cache = ItemIdSet()  # in memory: replays stay repeatable
+    elif MATCHER_SERVICE_URL:
+        # warm model in matcher_service.py; loaded here only if it is down
+        matcher = connect_matcher(MATCHER_SERVICE_URL, fallback=build_matcher, logger=logger)
+    else:
+        matcher = build_matcher()
     mailed = 0
 
+    if STORAGE_FORMAT == "jsonl":
+        store = VehicleStore(data_dir)
+        if not len(store) and not replay:
+            store.migrate_yaml()  # one-shot import of the old YAML archive
+        archive = store.append
+    else:
+        store = None
+        archive = lambda cars: _save_batch_to_yaml(cars, logger, data_dir)
+
+    crawl_index = None
+    if INCREMENTAL and not replay:
+        crawl_index = CrawlIndex(CRAWL_INDEX, revisit_ttl_hours=REVISIT_TTL_HOURS)
+        if not len(crawl_index):
+            crawl_index.mark_fetched(_archived_urls(store))
+            logger.info("Crawl index seeded with %d archived URLs", len(crawl_index))
+
+    def save_batch(cars: list[dict]):
+        with metrics.timer("archive_save_seconds", format=STORAGE_FORMAT):
+            archive(cars)
+        metrics.inc("vehicles_saved_total", len(cars))
+        if crawl_index is not None:
+            crawl_index.mark_fetched(car["url"] for car in cars)
+
+    # mail addresses per query owner (data/users.json; smtp.to for "default")
+    users = getattr(matcher, "query_registry", None) or QueryRegistry(recipients=SEND_TO)
+
+    def notify(hits: list):
+        for user, found in group_hits(hits).items():
+            send_to = users.snapshot().store.recipients(user)
+            if not send_to:
+                logger.warning("  ↪ %d hits for %s – no recipients", len(found), user)
+                continue
+            logger.info(
+                "  ↪ %d hits for %s – would send e‑mail to %s",
+                len(found), user, ", ".join(send_to),
+            )
+
+            # Skip for now, since the SMTP Server is not setup
+            # -------------------------------------------------------
+            # send_car_email(
+            #     send_from=SEND_FROM,
+            #     send_to=send_to,
+            #     recipiant_name=user,
+            #     found_cars=found,
+            #     smtp_host=SMTP_HOST,
+            #     smtp_port=SMTP_PORT,
+            #     smtp_user=SMTP_USER,
+            #     smtp_password=SMTP_PASSWD,
+            # )
+            # -------------------------------------------------------
+
     try:
-        for batch_idx, links_chunk in enumerate(
-            parser.scrape_all_links(
-                BASE_URL,
-                MAX_PAGES,
-                batch_size=BATCH_SIZE,
-                seen_links=matcher.sent_cache,
-            ),
-            start=1,
-        ):
+        link_batches = parser.scrape_all_links(
+            BASE_URL,
+            MAX_PAGES,
+            batch_size=BATCH_SIZE,
+            # a listing is skipped only once every user was mailed it
+            seen_links=matcher.seen_links,
+            crawl_index=crawl_index,
+            stop_on_known_page=STOP_ON_KNOWN_PAGE,
+        )
+        if WORKERS > 1 or PIPELINE:
+            # N drivers load pages; they come back in completion order
+            pool = DriverPool(
+                max(WORKERS, 1),
+                headless=CONFIG["scraper"]["headless"],
+                delay_range=tuple(CONFIG["scraper"]["delay"]),
+                rate_limiter=limiter,
+                http_fetcher=http,
+                snapshots=snapshots,
+                factory=factory,
+            )
+
+        if PIPELINE:
+            # discovery, fetch, parse, persist and scoring run concurrently
+            def score(cars):
+                hits = matcher.match(cars, batch_size=BATCH_SIZE, threshold=THRESHOLD)
+                notify(hits)
+                return hits
 
-            logger.info("• Batch #%02d – %d links", batch_idx, len(links_chunk))
+            report = asyncio.run(
+                Pipeline(
+                    link_batches,
+                    pool,
+                    parse_pool,
+                    save_batch=save_batch,
+                    score_batch=score,
+                    batch_size=BATCH_SIZE,
+                    queue_size=QUEUE_SIZE,
+                ).run()
+            )
+            mailed = report["hits"]
+            car_batches = []
+        else:
+            urls = (url for chunk in link_batches for url in chunk)
+            if WORKERS > 1:
+                pages = pool.imap_unordered(urls, fetch_page)
+            else:
+                pages = (fetch_page(parser, url) for url in urls)
+            car_batches = iter_batches(parse_pool.imap(pages), BATCH_SIZE, BATCH_WAIT_S)
 
-            # Parse this batch
-            cars = [parse_vehicle(parser, url) for url in links_chunk]
+        for batch_idx, cars in enumerate(car_batches, start=1):
 
-            _save_batch_to_yaml(cars, logger)
+            logger.info("• Batch #%02d – %d cars", batch_idx, len(cars))
+
+            save_batch(cars)
 
             # Match the batch entries
             hits = matcher.match(cars, batch_size=BATCH_SIZE, threshold=THRESHOLD)
 
             if hits:
                 mailed += len(hits)
-                logger.info("  ↪ %d hits – would send e‑mail", len(hits))
-
-                # Skip for now, since the SMTP Server is not setup
-                # -------------------------------------------------------
-                # send_car_email(
-                #     send_from=SEND_FROM,
-                #     send_to=SEND_TO,
-                #     recipiant_name="User",
-                #     found_cars=hits,
-                #     smtp_host=SMTP_HOST,
-                #     smtp_port=SMTP_PORT,
-                #     smtp_user=SMTP_USER,
-                #     smtp_password=SMTP_PASSWD,
-                # )
-                # -------------------------------------------------------
+                notify(hits)
 
         logger.info(
             "✓ Job finished – %s new matches found (mail disabled).",
             mailed if mailed else "no",
         )
     finally:
+        if pool is not None:
+            pool.close()
+        parse_pool.close()
         parser.close()
+        matcher.close()  # scoring workers and batcher thread; the scheduler process lives on
+        if http is not None:
+            http.close()
+        if crawl_index is not None:
+            crawl_index.close()
+        if replay_dir is not None:
+            replay_dir.cleanup()
         logger.info("Driver closed")
+        _export_metrics(logger, mailed=mailed, replay=replay)
 
 
 if __name__ == "__main__":
-    run_daily_job()
+    cli = argparse.ArgumentParser(description="Run the scrape & match job once")
+    cli.add_argument(
+        "--replay",
+        nargs="?",
+        const="latest",
+        metavar="RUN",
+        help="replay a recorded run from scraper.snapshot_dir instead of crawling "
+        "(see: python snapshot_store.py runs) [default: latest]",
+    )
+    args = cli.parse_args()
+    run_daily_job(replay=args.replay)
@@ -0,0 +1,112 @@
+"""
+Process pool that turns raw page sources into vehicle dicts.
+
+The thread driving Chrome only hands ``(url, page_source)`` over and goes on
+to the next page, while parse workers run ``extractor.extract_vehicle`` on
+other cores. With *raw_html_dir* set, every page is also written there
+(one ``.html`` per URL, the file name is the quoted URL) so parsing can be
+replayed offline, e.g. ``python extractor.py <raw_html_dir>``.
+"""
+
+# standard library
+import logging
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+# project imports
+import metrics
+from extractor import extract_vehicle
+
+
+def raw_html_path(html_dir: str | Path, url: str) -> Path:
+    return Path(html_dir) / f"{quote(url, safe='')}.html"
+
+
+def iter_raw_pages(html_dir: str | Path) -> Iterator[tuple[str, str]]:
+    """``(url, html)`` of every page saved in *html_dir*."""
+    for path in sorted(Path(html_dir).glob("*.html")):
+        yield unquote(path.stem), path.read_text(encoding="utf-8")
+
+
+def _parse_page(url: str, html: str, engine: str, html_dir: str | None) -> tuple[dict, float]:
+    """Vehicle dict plus the seconds spent extracting it (timed in the worker)."""
+    if html_dir:
+        raw_html_path(html_dir, url).write_text(html, encoding="utf-8")
+    start = time.perf_counter()
+    car = extract_vehicle(url, html, engine)
+    return car, time.perf_counter() - start
+
+
+class ParsePool:
+    """
+    :param workers:      parse processes
+    :param extractor:    engine of extractor.extract_vehicle
+    :param raw_html_dir: also keep every page source here (``None`` = off)
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        extractor: str = "soup",
+        raw_html_dir: str | Path | None = None,
+    ):
+        self.logger = logging.getLogger("ArticleParser")
+        self.workers = workers
+        self.extractor = extractor
+        self.raw_html_dir = str(raw_html_dir) if raw_html_dir else None
+        if self.raw_html_dir:
+            Path(self.raw_html_dir).mkdir(parents=True, exist_ok=True)
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+
+    def submit(self, url: str, html: str) -> Future:
+        """Parse one page in a worker; the future resolves to the vehicle dict."""
+        result: Future = Future()
+
+        def done(fut: Future):
+            if not result.set_running_or_notify_cancel():
+                return
+            try:
+                car, seconds = fut.result()
+            except BaseException as exc:
+                metrics.inc("parse_failures_total")
+                result.set_exception(exc)
+            else:
+                metrics.observe("parse_seconds", seconds, engine=self.extractor)
+                result.set_result(car)
+
+        work = self._executor.submit(_parse_page, url, html, self.extractor, self.raw_html_dir)
+        work.add_done_callback(done)
+        return result
+
+    def imap(self, pages: Iterable[tuple[str, str]]) -> Iterator[dict]:
+        """
+        Parse ``(url, html)`` pairs and yield the dicts in input order.
+
+        *pages* is consumed lazily with at most two pages per worker queued,
+        so fetching the next pages overlaps with parsing the previous ones.
+        Pages that fail to parse are logged and skipped.
+        """
+        pending: deque[tuple[str, Future]] = deque()
+
+        def next_result():
+            url, fut = pending.popleft()
+            try:
+                return fut.result()
+            except Exception as exc:
+                self.logger.error("Parsing %s failed: %s", url, exc, exc_info=True)
+                return None
+
+        for url, html in pages:
+            pending.append((url, self.submit(url, html)))
+            if len(pending) >= 2 * self.workers and (car := next_result()) is not None:
+                yield car
+        while pending:
+            if (car := next_result()) is not None:
+                yield car
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
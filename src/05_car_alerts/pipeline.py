@@ -0,0 +1,272 @@
+"""
+asyncio pipeline for the daily job (scraper.pipeline: true).
+
+    discover ─▶ urls ─▶ fetch (N drivers) ─▶ pages ─▶ parse (ParsePool)
+             ─▶ cars ─▶ persist (batches) ─▶ batches ─▶ score (matcher thread)
+
+Every arrow is a bounded ``asyncio.Queue``: when the matcher falls behind,
+the queues fill up and the browsers stop fetching instead of piling pages
+up in memory. Each stage forwards one end marker per downstream worker, so
+the pipeline drains and stops on its own once link discovery is exhausted;
+an unexpected error cancels every stage.
+"""
+
+# standard library
+import asyncio
+import logging
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+
+# project imports
+from driver_pool import DriverPool
+from parse_pool import ParsePool
+
+_DONE = object()  # end‑of‑stream marker
+
+
+def _get_vehicle_html(parser, url: str) -> str:
+    # through the instance, so ReplayParser.get_vehicle_html is used in replays
+    return parser.get_vehicle_html(url)
+
+
+class _Queue(asyncio.Queue):
+    """Bounded queue that remembers its deepest fill level."""
+
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize)
+        self.max_depth = 0
+
+    def _put(self, item):
+        super()._put(item)
+        self.max_depth = max(self.max_depth, self.qsize())
+
+
+class StageStats:
+    """Items handled by one stage and the time its workers spent on them."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.failed = 0
+        self.busy = 0.0
+
+    def as_dict(self, elapsed: float) -> dict:
+        return {
+            "items": self.items,
+            "failed": self.failed,
+            "busy_s": round(self.busy, 3),
+            "items_per_s": round(self.items / elapsed, 3) if elapsed else 0.0,
+        }
+
+
+class Pipeline:
+    """
+    Overlap link discovery, page fetching, parsing, persistence and scoring.
+
+    :param link_batches:  URL lists, e.g. ``ArticleLinkParser.scrape_all_links(...)``
+    :param fetch_pool:    drivers that load the vehicle pages
+    :param parse_pool:    processes turning page sources into vehicle dicts
+    :param save_batch:    ``save_batch(cars)`` archives one batch (runs in a thread)
+    :param score_batch:   ``score_batch(cars) -> hits`` (runs on one matcher thread)
+    :param batch_size:    cars per persisted / scored batch
+    :param queue_size:    capacity of every inter‑stage queue
+    :param report_every:  seconds between queue‑depth log lines (0 = off)
+    """
+
+    def __init__(
+        self,
+        link_batches: Iterable[list[str]],
+        fetch_pool: DriverPool,
+        parse_pool: ParsePool,
+        save_batch: Callable[[list[dict]], None],
+        score_batch: Callable[[list[dict]], list],
+        batch_size: int = 10,
+        queue_size: int = 20,
+        report_every: float = 30.0,
+    ):
+        self.logger = logging.getLogger("Orchestrator")
+        self.link_batches = link_batches
+        self.fetch_pool = fetch_pool
+        self.save_batch = save_batch
+        self.score_batch = score_batch
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.parse_pool = parse_pool
+        self.report_every = report_every
+        self.stats = {
+            name: StageStats(name)
+            for name in ("discover", "fetch", "parse", "persist", "score")
+        }
+        self.hits = 0
+
+    # ------------------------------------------------------------------ #
+    #  Stages
+    # ------------------------------------------------------------------ #
+    async def _discover(self, out: asyncio.Queue, consumers: int):
+        stats = self.stats["discover"]
+        links = iter(self.link_batches)
+        while True:
+            start = time.perf_counter()
+            chunk = await asyncio.to_thread(next, links, None)
+            stats.busy += time.perf_counter() - start
+            if chunk is None:
+                break
+            for url in chunk:
+                stats.items += 1
+                await out.put(url)
+        for _ in range(consumers):
+            await out.put(_DONE)
+
+    async def _stage(
+        self,
+        stats: StageStats,
+        inbox: asyncio.Queue,
+        outbox: asyncio.Queue,
+        handle,
+        workers: int,
+        consumers: int,
+    ):
+        """Run *workers* copies of ``await handle(item)`` between two queues."""
+
+        async def worker():
+            while (item := await inbox.get()) is not _DONE:
+                start = time.perf_counter()
+                try:
+                    result = await handle(item)
+                except Exception as exc:
+                    stats.failed += 1
+                    self.logger.error("%s failed: %s", stats.name, exc, exc_info=True)
+                    continue
+                finally:
+                    stats.busy += time.perf_counter() - start
+                stats.items += 1
+                await outbox.put(result)
+
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        for _ in range(consumers):
+            await outbox.put(_DONE)
+
+    async def _persist(self, inbox: asyncio.Queue, outbox: asyncio.Queue):
+        stats = self.stats["persist"]
+        batch: list[dict] = []
+        while True:
+            car = await inbox.get()
+            if car is not _DONE:
+                batch.append(car)
+            if batch and (car is _DONE or len(batch) == self.batch_size):
+                start = time.perf_counter()
+                try:
+                    await asyncio.to_thread(self.save_batch, batch)
+                    stats.items += len(batch)
+                except Exception as exc:
+                    # keep scoring even if the archive write failed
+                    stats.failed += len(batch)
+                    self.logger.error("persist failed: %s", exc, exc_info=True)
+                stats.busy += time.perf_counter() - start
+                await outbox.put(batch)
+                batch = []
+            if car is _DONE:
+                break
+        await outbox.put(_DONE)
+
+    async def _score(self, inbox: asyncio.Queue, executor: ThreadPoolExecutor):
+        stats = self.stats["score"]
+        loop = asyncio.get_running_loop()
+        while (cars := await inbox.get()) is not _DONE:
+            start = time.perf_counter()
+            try:
+                hits = await loop.run_in_executor(executor, self.score_batch, cars)
+            except Exception as exc:
+                stats.failed += len(cars)
+                self.logger.error("score failed: %s", exc, exc_info=True)
+                continue
+            finally:
+                stats.busy += time.perf_counter() - start
+            stats.items += len(cars)
+            self.hits += len(hits or [])
+
+    async def _monitor(self, queues: dict[str, _Queue]):
+        while True:
+            await asyncio.sleep(self.report_every)
+            self.logger.info(
+                "  queues %s  | done %s",
+                "  ".join(f"{n}={q.qsize()}/{q.maxsize}" for n, q in queues.items()),
+                "  ".join(f"{s.name}={s.items}" for s in self.stats.values()),
+            )
+
+    # ------------------------------------------------------------------ #
+    #   Main Entry Point
+    # ------------------------------------------------------------------ #
+    async def run(self) -> dict:
+        """Drive all stages to completion and return the per‑stage report."""
+        queues = {
+            name: _Queue(self.queue_size) for name in ("urls", "pages", "cars", "batches")
+        }
+        fetchers = self.fetch_pool.size
+        parsers = self.parse_pool.workers
+        matcher_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="matcher")
+
+        async def fetch(url: str) -> tuple[str, str]:
+            future = self.fetch_pool.submit(_get_vehicle_html, url)
+            return url, await asyncio.wrap_future(future)
+
+        async def parse(page: tuple[str, str]) -> dict:
+            return await asyncio.wrap_future(self.parse_pool.submit(*page))
+
+        start = time.perf_counter()
+        monitor = asyncio.create_task(self._monitor(queues)) if self.report_every else None
+        stages = [
+            asyncio.create_task(self._discover(queues["urls"], fetchers)),
+            asyncio.create_task(
+                self._stage(
+                    self.stats["fetch"],
+                    queues["urls"],
+                    queues["pages"],
+                    fetch,
+                    fetchers,
+                    parsers,
+                )
+            ),
+            asyncio.create_task(
+                self._stage(
+                    self.stats["parse"],
+                    queues["pages"],
+                    queues["cars"],
+                    parse,
+                    parsers,
+                    1,
+                )
+            ),
+            asyncio.create_task(self._persist(queues["cars"], queues["batches"])),
+            asyncio.create_task(self._score(queues["batches"], matcher_thread)),
+        ]
+        try:
+            await asyncio.gather(*stages)
+        except BaseException:
+            for task in stages:
+                task.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+            raise
+        finally:
+            if monitor is not None:
+                monitor.cancel()
+            matcher_thread.shutdown(wait=True, cancel_futures=True)
+
+        elapsed = time.perf_counter() - start
+        report = {
+            "elapsed_s": round(elapsed, 3),
+            "hits": self.hits,
+            "stages": {name: s.as_dict(elapsed) for name, s in self.stats.items()},
+            "max_queue_depth": {name: q.max_depth for name, q in queues.items()},
+        }
+        for name, s in report["stages"].items():
+            self.logger.info(
+                "  %-8s %5d items  %6.2f/s  busy %.1fs  failed %d",
+                name,
+                s["items"],
+                s["items_per_s"],
+                s["busy_s"],
+                s["failed"],
+            )
+        return report
@@ -0,0 +1,414 @@
+"""
+Structured pre‑filter: hard constraints from queries vs. typed vehicle columns.
+
+Queries such as "less than 200.000km, petrol, red car" name limits on fields
+the scraper already collects (``Read mileage``, ``Power output``,
+``First registration``, ``Fuel type``, ``Colour``). Those limits are compiled
+once per query, the vehicle fields of a batch are normalised into NumPy
+columns, and impossible (query, car) pairs are dropped before the model runs.
+
+The parser is deliberately conservative: only explicit comparisons are turned
+into constraints, negated mentions are ignored and a car with an unknown value
+always passes. A missed constraint costs one model call, a wrong one a lost hit.
+
+Recall on the labelled pairs (positives that survive the filter) and the
+share of negatives it saves the model, per constraint:
+
+    python prefilter.py --show 10
+"""
+
+# standard library
+import argparse
+import json
+import math
+import re
+from collections import Counter
+from pathlib import Path
+from urllib.parse import urlparse
+
+# third party libraries
+import numpy as np
+import yaml
+
+KW_TO_PS = 1.35962
+MILES_TO_KM = 1.609344
+# tolerance on numeric limits; the training labels are fuzzy near boundaries
+SLACK = {"mileage_km": 0.10, "power_kw": 0.10, "power_ps": 0.10}
+YEAR_SLACK = 1
+
+# ------- categorical families (bit flags) ---------------------------------- #
+
+FUELS = {
+    "petrol": 1 << 0,
+    "diesel": 1 << 1,
+    "electric": 1 << 2,
+    "hybrid": 1 << 3,
+    "gas": 1 << 4,
+}
+COLOURS = {
+    "black": 1 << 0,
+    "white": 1 << 1,
+    "grey": 1 << 2,
+    "red": 1 << 3,
+    "blue": 1 << 4,
+    "green": 1 << 5,
+    "yellow": 1 << 6,
+    "orange": 1 << 7,
+    "brown": 1 << 8,
+    "purple": 1 << 9,
+}
+# spelling -> family; close shades share a family so borderline cars survive
+_COLOUR_WORDS = {
+    "black": "black",
+    "white": "white",
+    "grey": "grey",
+    "gray": "grey",
+    "silver": "grey",
+    "anthracite": "grey",
+    "red": "red",
+    "bordeaux": "red",
+    "maroon": "red",
+    "blue": "blue",
+    "navy": "blue",
+    "green": "green",
+    "yellow": "yellow",
+    "gold": "yellow",
+    "orange": "orange",
+    "brown": "brown",
+    "beige": "brown",
+    "bronze": "brown",
+    "purple": "purple",
+    "violet": "purple",
+}
+_VEHICLE_FUEL_WORDS = [
+    (re.compile(r"petrol|benzin|gasoline|otto", re.I), "petrol"),
+    (re.compile(r"diesel", re.I), "diesel"),
+    (re.compile(r"electric", re.I), "electric"),
+    (re.compile(r"hybrid", re.I), "hybrid"),
+    (re.compile(r"\bgas\b|cng|lpg", re.I), "gas"),
+]
+_QUERY_FUEL_WORDS = [
+    (re.compile(r"\b(?:petrol|gasoline|benzin)\b", re.I), "petrol"),
+    (re.compile(r"\bdiesel\b", re.I), "diesel"),
+    # "electric windows" is equipment, only an electric drive counts
+    (
+        re.compile(
+            r"\b(?:fully |purely |all[- ])?electric(?:ally)?[- ]"
+            r"(?:car|vehicle|suv|engine|motor|drive|powertrain|powered|fuel)\b"
+            r"|\bev\b|\bfuel type (?:of |is |should be )?electric\b",
+            re.I,
+        ),
+        "electric",
+    ),
+    (re.compile(r"\b(?:plug-?in[- ]|mild[- ]?)?hybrid\b", re.I), "hybrid"),
+    (re.compile(r"\bnatural gas\b|\bcng\b|\blpg\b|\bgas[- ]powered\b", re.I), "gas"),
+]
+
+# ------- query grammar ---------------------------------------------------- #
+
+_NUM = r"(\d{1,3}(?:[.,]\d{3})+|\d+)\s*(k\b)?"
+_LT = r"less than|fewer than|under|below|lower than|at most|maximum(?: of)?|max\.?|up to"
+_GT = r"more than|over|above|greater than|higher than|at least|minimum(?: of)?|min\.?|exceeding|in excess of"
+_COMP = rf"(\bnot\s+(?:\w+\s+){{0,2}}?|\bno\s+)?({_LT}|{_GT})"
+_GT_RE = re.compile(rf"^(?:{_GT})$", re.I)
+
+_MILEAGE_RE = re.compile(
+    rf"{_COMP}\s+(?:a\s+mileage\s+of\s+)?{_NUM}\s*(km|kms|kilomet\w*|miles?)\b", re.I
+)
+_MILEAGE_TAIL_RE = re.compile(
+    rf"{_NUM}\s*(km|kms|kilomet\w*|miles?)\s+or\s+(less|fewer|below|more|above)\b", re.I
+)
+_POWER_UNIT = r"(?:ps|hp|bhp|kw)"
+# "180 KW/PS", "150 kW or PS": the unit is ambiguous, so no constraint
+_POWER_RE = re.compile(
+    rf"{_COMP}\s+{_NUM}\s*(ps|hp|bhp|kw)\b(?!\s*(?:/|or)\s*{_POWER_UNIT}\b)", re.I
+)
+_YEAR_RE = re.compile(
+    r"(?:regist\w*|built|manufactured|model year|made)[^.;!?]{0,40}?\b"
+    r"(not? older than|not? newer than|not? earlier than|not? later than|newer than|older than"
+    r"|later than|earlier than"
+    r"|after|post|since|from|before|prior to|in)\s+(?:the\s+year\s+)?((?:19|20)\d\d)\b"
+    r"|\b(not? older than|newer than)\s+((?:19|20)\d\d)\b",
+    re.I,
+)
+_YEAR_MIN = {
+    "not older than", "not earlier than", "newer than", "later than", "after", "post", "since", "from"
+}
+_YEAR_MAX = {"not newer than", "not later than", "older than", "earlier than", "before", "prior to"}
+
+_COLOUR = "|".join(sorted(_COLOUR_WORDS, key=len, reverse=True))
+_COLOUR_LIST = rf"(?:{_COLOUR})(?:\s*(?:,|/|or|and|,\s*or)\s*(?:{_COLOUR}))*"
+_BODY = (
+    r"car|vehicle|suv|saloon|sedan|estate|hatchback|convertible|cabriolet|coup[eé]"
+    r"|van|minivan|mpv|limousine|roadster|pick-?up|wagon|off-road\w*|small car|compact car"
+)
+_COLOUR_RES = [
+    # "red car", "silver metallic SUV", "black or white 5-door hatchback"
+    re.compile(
+        rf"\b({_COLOUR_LIST})(?:[\s-]+(?:metallic|pearl\w*|paint\w*|colou?red))?"
+        rf"(?:[\s-]+\d-door)?[\s-]+(?:{_BODY})\b",
+        re.I,
+    ),
+    # "grey in colour", "red color"
+    re.compile(rf"\b({_COLOUR_LIST})\s+(?:in\s+)?colou?r\b", re.I),
+    # "colour should be blue", "colour: black"
+    re.compile(rf"\bcolou?r\s*(?:should be|must be|is|of|:)?\s*({_COLOUR_LIST})\b", re.I),
+]
+_NEGATED_RE = re.compile(r"\b(?:not|no|except|other than|without)\s+(?:a\s+|an\s+)?(\w+)", re.I)
+
+
+def _number(digits: str, k_suffix: str | None) -> float:
+    value = float(re.sub(r"[.,]", "", digits))
+    return value * 1000 if k_suffix else value
+
+
+def _bound(constraints: dict, column: str, lower: float | None, upper: float | None):
+    lo, hi = constraints.get(column, [None, None])
+    if lower is not None:
+        lo = lower if lo is None else max(lo, lower)
+    if upper is not None:
+        hi = upper if hi is None else min(hi, upper)
+    constraints[column] = [lo, hi]
+
+
+def _is_upper(negation: str | None, comparator: str) -> bool:
+    """True for "less than"-style limits; "not more than" flips the direction."""
+    upper = not _GT_RE.match(comparator.strip())
+    return upper != bool(negation)
+
+
+def parse_query(text: str) -> dict:
+    """
+    Extract hard constraints from a free‑text query.
+
+    :return: JSON‑serialisable dict; numeric columns map to ``[min, max]``
+             (``None`` = open), categorical ones to a list of families
+    """
+    constraints: dict = {}
+    negated = {m.group(1).lower() for m in _NEGATED_RE.finditer(text)}
+
+    for neg, comp, digits, k, unit in _MILEAGE_RE.findall(text):
+        km = _number(digits, k) * (MILES_TO_KM if unit.lower().startswith("mile") else 1)
+        if _is_upper(neg, comp):
+            _bound(constraints, "mileage_km", None, km)
+        else:
+            _bound(constraints, "mileage_km", km, None)
+    for digits, k, unit, direction in _MILEAGE_TAIL_RE.findall(text):
+        km = _number(digits, k) * (MILES_TO_KM if unit.lower().startswith("mile") else 1)
+        if direction.lower() in ("less", "fewer", "below"):
+            _bound(constraints, "mileage_km", None, km)
+        else:
+            _bound(constraints, "mileage_km", km, None)
+
+    for neg, comp, digits, k, unit in _POWER_RE.findall(text):
+        column = "power_kw" if unit.lower() == "kw" else "power_ps"
+        value = _number(digits, k)
+        if _is_upper(neg, comp):
+            _bound(constraints, column, None, value)
+        else:
+            _bound(constraints, column, value, None)
+
+    for m in _YEAR_RE.finditer(text):
+        # "no earlier than" reads as "not earlier than"
+        word = re.sub(r"^no\s", "not ", (m.group(1) or m.group(3)).lower())
+        year = int(m.group(2) or m.group(4))
+        if word in _YEAR_MIN:
+            _bound(constraints, "year", year, None)
+        elif word in _YEAR_MAX:
+            _bound(constraints, "year", None, year)
+        elif word == "in":
+            _bound(constraints, "year", year, year)
+
+    fuels = {fuel for pattern, fuel in _QUERY_FUEL_WORDS if pattern.search(text)}
+    if fuels and not negated & {"petrol", "gasoline", "diesel", "electric", "hybrid", "gas"}:
+        constraints["fuel"] = sorted(fuels)
+
+    colours = set()
+    for pattern in _COLOUR_RES:
+        for listed in pattern.findall(text):
+            colours.update(
+                _COLOUR_WORDS[w.lower()] for w in re.findall(_COLOUR, listed, re.I)
+            )
+    if colours and not negated & set(_COLOUR_WORDS):
+        constraints["colour"] = sorted(colours)
+
+    return constraints
+
+
+def compile_queries(rows: list[dict]) -> list[dict]:
+    """Attach ``constraints`` to every query row (done when queries.json is saved)."""
+    return [{**row, "constraints": parse_query(row.get("query", ""))} for row in rows]
+
+
+# ------- vehicle columns -------------------------------------------------- #
+
+
+def _information(car: dict) -> dict:
+    return car.get("information_dict") or car.get("information") or {}
+
+
+def _first_number(text: str, pattern: str) -> float:
+    m = re.search(pattern, text, re.I)
+    return _number(m.group(1), None) if m else math.nan
+
+
+def vehicle_attributes(car: dict) -> dict:
+    """Typed view of the fields the pre‑filter compares; NaN / 0 mean unknown."""
+    info = _information(car)
+
+    mileage = str(info.get("Read mileage") or "")
+    mileage_km = _first_number(mileage, r"(\d{1,3}(?:[.,]\d{3})+|\d+)\s*(?:km|kilomet)")
+    if math.isnan(mileage_km):
+        mileage_km = _first_number(mileage, r"(\d{1,3}(?:[.,]\d{3})+|\d+)\s*miles?") * MILES_TO_KM
+
+    power = str(info.get("Power output") or "")
+    power_kw = _first_number(power, r"(\d+)\s*kw")
+    power_ps = _first_number(power, r"(\d+)\s*ps")
+    if math.isnan(power_ps) and not math.isnan(power_kw):
+        power_ps = round(power_kw * KW_TO_PS)
+
+    year = _first_number(str(info.get("First registration") or ""), r"((?:19|20)\d\d)")
+
+    fuel_text = f"{info.get('Fuel type') or ''} {info.get('Engine type') or ''}"
+    fuel = 0
+    for pattern, family in _VEHICLE_FUEL_WORDS:
+        if pattern.search(fuel_text):
+            fuel |= FUELS[family]
+    if fuel == FUELS["hybrid"]:
+        # a bare "Mild-Hybrid" / "Plug-in-Hybrid" may burn either fuel
+        fuel |= FUELS["petrol"] | FUELS["diesel"]
+
+    colour = 0
+    colour_text = f"{info.get('Colour') or ''} {info.get('Colour name') or ''}"
+    for word in re.findall(r"[a-z]+", colour_text.lower()):
+        if word in _COLOUR_WORDS:
+            colour |= COLOURS[_COLOUR_WORDS[word]]
+
+    return {
+        "mileage_km": mileage_km,
+        "power_kw": power_kw,
+        "power_ps": power_ps,
+        "year": year,
+        "fuel": fuel,
+        "colour": colour,
+    }
+
+
+def vehicle_columns(cars: list[dict]) -> dict[str, np.ndarray]:
+    """Column‑wise arrays of :func:`vehicle_attributes` for a batch of cars."""
+    rows = [vehicle_attributes(car) for car in cars]
+    numeric = ("mileage_km", "power_kw", "power_ps", "year")
+    columns = {
+        name: np.array([r[name] for r in rows], dtype=np.float64) for name in numeric
+    }
+    for name in ("fuel", "colour"):
+        columns[name] = np.array([r[name] for r in rows], dtype=np.int64)
+    return columns
+
+
+# ------- mask ------------------------------------------------------------- #
+
+
+def url_slug(url: str) -> str:
+    """``https://autobid.de/en/item/bmw-x5-3112251/details`` → ``bmw-x5-3112251``"""
+    parts = [p for p in urlparse(url).path.split("/") if p]
+    if "item" in parts and parts.index("item") + 1 < len(parts):
+        return parts[parts.index("item") + 1].lower()
+    return url.lower()
+
+
+def constraint_row(constraints: dict, columns: dict[str, np.ndarray]) -> np.ndarray:
+    """Bool vector over the batch: cars that can still satisfy *constraints*."""
+    n = len(next(iter(columns.values()))) if columns else 0
+    ok = np.ones(n, dtype=bool)
+    for name in ("mileage_km", "power_kw", "power_ps", "year"):
+        if name not in constraints:
+            continue
+        lo, hi = constraints[name]
+        col = columns[name]
+        known = ~np.isnan(col)
+        if name == "year":
+            lo = None if lo is None else lo - YEAR_SLACK
+            hi = None if hi is None else hi + YEAR_SLACK
+        else:
+            lo = None if lo is None else lo * (1 - SLACK[name])
+            hi = None if hi is None else hi * (1 + SLACK[name])
+        if lo is not None:
+            ok &= ~known | (col >= lo)
+        if hi is not None:
+            ok &= ~known | (col <= hi)
+    for name, families in (("fuel", FUELS), ("colour", COLOURS)):
+        if name not in constraints:
+            continue
+        wanted = 0
+        for family in constraints[name]:
+            wanted |= families.get(family, 0)
+        col = columns[name]
+        ok &= (col == 0) | ((col & wanted) != 0)
+    return ok
+
+
+# ------- recall report ---------------------------------------------------- #
+
+REPO_DATA = Path(__file__).resolve().parents[2] / "data"
+
+
+def recall_report(questions_file: Path, vehicles_file: Path) -> dict:
+    """Kept / dropped labelled pairs, and which constraint dropped each lost positive."""
+    questions = json.loads(questions_file.read_text(encoding="utf-8"))
+    with vehicles_file.open(encoding="utf-8") as fh:
+        vehicles = yaml.load(fh, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+    counts = Counter()
+    dropped_by = Counter()
+    lost = []
+    for url, labelled in questions.items():
+        if url not in vehicles:
+            continue
+        columns = vehicle_columns([{**vehicles[url], "url": url}])
+        for query, label in labelled.items():
+            constraints = parse_query(query)
+            kept = bool(constraint_row(constraints, columns)[0])
+            counts[("positives" if label else "negatives", kept)] += 1
+            if label and not kept:
+                culprits = [
+                    name
+                    for name in constraints
+                    if not constraint_row({name: constraints[name]}, columns)[0]
+                ]
+                dropped_by.update(culprits)
+                lost.append({"url": url, "query": query, "constraints": constraints})
+
+    positives = counts[("positives", True)] + counts[("positives", False)]
+    negatives = counts[("negatives", True)] + counts[("negatives", False)]
+    return {
+        "positives": positives,
+        "recall": counts[("positives", True)] / positives if positives else 1.0,
+        "negatives": negatives,
+        "negatives_dropped": counts[("negatives", False)] / negatives if negatives else 0.0,
+        "lost_by_constraint": dict(dropped_by.most_common()),
+        "lost": lost,
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Recall of the structured pre-filter")
+    p.add_argument("--questions", type=Path, default=REPO_DATA / "generated_questions.json")
+    p.add_argument("--vehicles", type=Path, default=REPO_DATA / "vehicles_info.yaml")
+    p.add_argument("--show", type=int, default=0, help="print this many lost positives")
+    args = p.parse_args()
+
+    report = recall_report(args.questions, args.vehicles)
+    print(
+        f"{report['positives']} positive pairs: recall {report['recall']:.2%} "
+        f"({len(report['lost'])} lost)"
+    )
+    print(f"{report['negatives']} negative pairs: {report['negatives_dropped']:.2%} skipped")
+    for name, n in report["lost_by_constraint"].items():
+        print(f"  lost by {name:<10} {n}")
+    for row in report["lost"][: args.show]:
+        print(f"  {row['constraints']}  ←  {row['query']}")
+
+
+if __name__ == "__main__":
+    main()
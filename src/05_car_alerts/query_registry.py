@@ -0,0 +1,150 @@
+"""
+Hot‑reloaded queries (data/queries.json + data/users.json) as versioned snapshots.
+
+The GUI rewrites ``queries.json`` while the job runs, so the matcher asks
+for the current queries before every batch. :meth:`QueryRegistry.snapshot`
+answers from memory as long as size and mtime of both files are unchanged
+(one ``stat`` each); a touched file is re‑read and hashed, and only a
+different content builds a new :class:`QuerySnapshot`.
+
+A new snapshot is diffed against the previous one and handed to
+*on_change* before anyone sees it, so the matcher can tokenize / embed the
+added queries and forget the removed ones up front. Everything derived from
+one query text is reused across versions; a batch with unchanged queries
+does no query work at all.
+"""
+
+# standard library
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+# project imports
+import metrics
+from prefilter import parse_query
+from query_store import QUERIES_FILE, USERS_FILE, QueryStore
+from token_cache import content_hash
+
+# a file modified this close to our read may change again within the same
+# mtime tick; such a stamp is never trusted and the content is hashed again
+RACY_S = 2.0
+
+_logger = logging.getLogger("Orchestrator")
+
+
+class QuerySnapshot:
+    """
+    One immutable version of the queries, with the per‑query data the matcher needs.
+
+    :param version:  increases with every content change (1 = first load)
+    :param store:    rows, users and brand index
+    :param previous: snapshot this one replaces (for the diff and reuse)
+    """
+
+    def __init__(self, version: int, store: QueryStore, previous: "QuerySnapshot | None" = None):
+        self.version = version
+        self.store = store
+        self.texts = [q["query"] for q in store.queries]
+        self.hashes = [content_hash(t) for t in self.texts]
+
+        old = set(previous.texts) if previous is not None else set()
+        new = set(self.texts)
+        self.added = [t for t in dict.fromkeys(self.texts) if t not in old]
+        self.removed = sorted(old - new)
+
+        # constraints compiled by the GUI win; otherwise each text is parsed once
+        parsed = dict(zip(previous.texts, previous.constraints)) if previous is not None else {}
+        self.constraints = []
+        for q in store.queries:
+            constraints = q.get("constraints")
+            if constraints is None:
+                constraints = parsed.get(q["query"])
+            if constraints is None:
+                constraints = parsed[q["query"]] = parse_query(q["query"])
+            self.constraints.append(constraints)
+
+        # rows of the bi‑encoder (queries × dim), filled by the matcher's on_change
+        self.embeddings = None
+
+    @property
+    def queries(self) -> list[dict]:
+        return self.store.queries
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+
+def _stamp(path: Path) -> tuple[int, int] | None:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class QueryRegistry:
+    """
+    :param queries_file: rows saved by the GUI
+    :param users_file:   ``{user: {"recipients": [...]}}`` (optional)
+    :param recipients:   addresses of ``default`` when *users_file* does not list it
+    :param on_change:    called with every new snapshot before it is published
+    """
+
+    def __init__(
+        self,
+        queries_file: str | Path = QUERIES_FILE,
+        users_file: str | Path = USERS_FILE,
+        recipients: str | list[str] | None = None,
+        on_change: Callable[[QuerySnapshot], None] | None = None,
+    ):
+        self.queries_file = Path(queries_file)
+        self.users_file = Path(users_file)
+        self.recipients = recipients
+        self.on_change = on_change
+        self._lock = threading.Lock()
+        self._current: QuerySnapshot | None = None
+        self._stamps: tuple | None = None
+        self._digest = ""
+
+    @property
+    def version(self) -> int:
+        return self._current.version if self._current is not None else 0
+
+    def snapshot(self) -> QuerySnapshot:
+        """The current queries; re‑read only when one of the files changed."""
+        with self._lock:
+            stamps = (_stamp(self.queries_file), _stamp(self.users_file))
+            if self._current is not None and stamps == self._stamps:
+                return self._current
+
+            raw_queries = self.queries_file.read_bytes()  # missing file: FileNotFoundError
+            raw_users = self.users_file.read_bytes() if stamps[1] is not None else b""
+            digest = hashlib.blake2b(raw_queries + b"\0" + raw_users, digest_size=16).hexdigest()
+            # trust the stamps only once the files are older than an mtime tick
+            newest = max(s[0] for s in stamps if s is not None) / 1e9
+            trusted = stamps if time.time() - newest > RACY_S else None
+            if self._current is not None and digest == self._digest:
+                self._stamps = trusted
+                return self._current
+
+            with metrics.timer("query_reload_seconds"):
+                store = QueryStore(
+                    json.loads(raw_queries),
+                    json.loads(raw_users) if raw_users else {},
+                    self.recipients,
+                )
+                snapshot = QuerySnapshot(self.version + 1, store, self._current)
+                if self.on_change is not None:
+                    self.on_change(snapshot)
+            self._current, self._digest, self._stamps = snapshot, digest, trusted
+            metrics.inc("query_reloads_total")
+            metrics.set_gauge("queries_version", snapshot.version)
+            _logger.info(
+                "Queries v%d: %d rows (+%d / -%d)",
+                snapshot.version, len(snapshot), len(snapshot.added), len(snapshot.removed),
+            )
+            return snapshot
@@ -0,0 +1,136 @@
+"""
+Queries of several users, indexed by brand (data/queries.json + data/users.json).
+
+Every row of ``queries.json`` may name the ``user`` it belongs to (rows
+without one belong to ``default``). ``users.json`` maps users to their
+mail recipients::
+
+    {"default": {"recipients": ["alice@example.com"]},
+     "bob":     {"recipients": ["bob@example.com"]}}
+
+``default`` falls back to ``smtp.to`` when it is not listed.
+
+The brand field keeps its meaning (every whitespace separated word must
+occur in the item slug of the URL), but instead of testing each query
+against each car, the store keeps an inverted index ``brand word →
+queries``: per car the slug is parsed once and only the distinct brand
+words are tested, so the candidates of a car cost O(brand words), not
+O(queries). Each user's mailed URLs live in their own sent file
+(``sent.ids`` for ``default``, ``sent_<user>.ids`` for everyone else).
+"""
+
+# standard library
+import json
+import re
+from collections import defaultdict
+from collections.abc import Iterable
+from pathlib import Path
+from typing import NamedTuple
+
+# project imports
+from prefilter import url_slug
+
+DEFAULT_USER = "default"
+QUERIES_FILE = Path("data/queries.json")
+USERS_FILE = Path("data/users.json")
+
+_UNSAFE = re.compile(r"[^\w.-]+")
+
+
+class Hit(NamedTuple):
+    url: str
+    query: str
+    user: str = DEFAULT_USER
+
+
+def sent_path(user: str, default: str | Path = Path("data/sent.ids")) -> Path:
+    """Sent file of *user*: *default* itself, or ``sent_<user>.ids`` next to it."""
+    default = Path(default)
+    if user == DEFAULT_USER:
+        return default
+    return default.with_name(f"{default.stem}_{_UNSAFE.sub('_', user)}{default.suffix}")
+
+
+def group_hits(hits: Iterable[Hit]) -> dict[str, list[tuple[str, str]]]:
+    """``{user: [(url, query), ...]}`` in hit order, ready for send_car_email."""
+    grouped: dict[str, list[tuple[str, str]]] = defaultdict(list)
+    for hit in hits:
+        grouped[hit.user].append((hit.url, hit.query))
+    return dict(grouped)
+
+
+class SentToAll:
+    """``url in view`` once *every* user was mailed the URL (for skipping links)."""
+
+    def __init__(self, caches: Iterable):
+        self.caches = list(caches)
+
+    def __contains__(self, url: str) -> bool:
+        return bool(self.caches) and all(url in cache for cache in self.caches)
+
+
+class QueryStore:
+    """
+    :param queries:    rows as saved by the GUI (``query``, ``brand``, ``constraints``, ``user``)
+    :param users:      ``{user: {"recipients": [...]}}``
+    :param recipients: addresses of ``default`` when *users* does not list it
+    """
+
+    def __init__(
+        self,
+        queries: list[dict],
+        users: dict | None = None,
+        recipients: str | list[str] | None = None,
+    ):
+        if isinstance(recipients, str):
+            recipients = [recipients]
+        self.queries = [{**q, "user": q.get("user") or DEFAULT_USER} for q in queries]
+        self.users = dict(users or {})
+        if DEFAULT_USER not in self.users and recipients:
+            self.users[DEFAULT_USER] = {"recipients": list(recipients)}
+
+        # brand word → queries that need it; queries without a brand apply to every car
+        self._words: dict[str, list[int]] = defaultdict(list)
+        self._needs: list[int] = []  # distinct brand words per query
+        self._unbranded: list[int] = []
+        for qi, q in enumerate(self.queries):
+            words = set((q.get("brand") or "").lower().split())
+            self._needs.append(len(words))
+            if not words:
+                self._unbranded.append(qi)
+            for word in words:
+                self._words[word].append(qi)
+
+    @classmethod
+    def load(
+        cls,
+        queries_file: str | Path = QUERIES_FILE,
+        users_file: str | Path = USERS_FILE,
+        recipients: str | list[str] | None = None,
+    ) -> "QueryStore":
+        queries = json.loads(Path(queries_file).read_text(encoding="utf-8"))
+        users_file = Path(users_file)
+        users = json.loads(users_file.read_text(encoding="utf-8")) if users_file.exists() else {}
+        return cls(queries, users, recipients)
+
+    def __len__(self) -> int:
+        return len(self.queries)
+
+    @property
+    def user_names(self) -> list[str]:
+        """Users with at least one query, in order of appearance."""
+        return list(dict.fromkeys(q["user"] for q in self.queries))
+
+    def recipients(self, user: str) -> list[str]:
+        return list(self.users.get(user, {}).get("recipients", []))
+
+    def candidates(self, url: str) -> list[int]:
+        """Indices of the queries whose brand words all occur in the URL's item slug."""
+        slug = url_slug(url)
+        found: dict[int, int] = defaultdict(int)
+        for word, queries in self._words.items():
+            if word in slug:
+                for qi in queries:
+                    found[qi] += 1
+        branded = [qi for qi, n in found.items() if n == self._needs[qi]]
+        return sorted(self._unbranded + branded)
@@ -0,0 +1,108 @@
+"""
+Recall report for the bi‑encoder prefilter (matcher.mode: retrieve_rerank).
+
+For every positive (query, car) pair in ``generated_questions.json`` the car
+is ranked inside a random pool of *pool_size* cars, the same situation the
+matcher faces for one scraper batch. recall@k is the share of positives that
+survive the top‑k cut and still reach the cross‑encoder.
+
+Run with terminal from root directory 05_car_alerts:
+
+    python retrieval_recall.py --pool-size 10 --ks 1 2 3 5
+"""
+
+# standard library
+import argparse
+import json
+import random
+from pathlib import Path
+
+# third party libraries
+import numpy as np
+import yaml
+
+# project imports
+from matcher import create_vehicle_description
+from retriever import DEFAULT_MODEL, BiEncoder
+
+REPO_DATA = Path(__file__).resolve().parents[2] / "data"
+Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def load_labelled_pairs(questions_file: Path, vehicles_file: Path):
+    """Return (urls, descriptions, [(query, car_index, label), ...])."""
+    questions = json.loads(questions_file.read_text(encoding="utf-8"))
+    with vehicles_file.open(encoding="utf-8") as fh:
+        vehicles = yaml.load(fh, Loader=Loader)
+
+    urls = [url for url in questions if url in vehicles]
+    texts = [create_vehicle_description(vehicles[url]) for url in urls]
+    pairs = [
+        (query, idx, bool(label))
+        for idx, url in enumerate(urls)
+        for query, label in questions[url].items()
+    ]
+    return urls, texts, pairs
+
+
+def recall_at_k(
+    encoder: BiEncoder,
+    texts: list[str],
+    pairs: list[tuple[str, int, bool]],
+    pool_size: int,
+    ks: list[int],
+    seed: int = 42,
+) -> dict:
+    rng = random.Random(seed)
+    positives = [(q, idx) for q, idx, label in pairs if label]
+    queries = sorted({q for q, _ in positives})
+    q_row = {q: i for i, q in enumerate(queries)}
+
+    similarity = encoder.similarity(queries, texts)  # (queries × cars)
+
+    ranks = []
+    others = list(range(len(texts)))
+    for query, idx in positives:
+        pool = [i for i in rng.sample(others, min(pool_size, len(others))) if i != idx]
+        pool = [idx] + pool[: pool_size - 1]
+        sims = similarity[q_row[query], pool]
+        # rank of the labelled car inside its pool (0 = most similar)
+        ranks.append(int((sims > sims[0]).sum()))
+
+    ranks = np.asarray(ranks)
+    return {
+        "positives": len(positives),
+        "pool_size": pool_size,
+        "recall": {str(k): float((ranks < k).mean()) for k in ks},
+        # share of cross-encoder calls that remain after the cut
+        "kept_pairs": {str(k): min(k, pool_size) / pool_size for k in ks},
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Bi-encoder recall@k report")
+    p.add_argument("--model", default=DEFAULT_MODEL, help="bi-encoder hub id / path")
+    p.add_argument("--questions", type=Path, default=REPO_DATA / "generated_questions.json")
+    p.add_argument("--vehicles", type=Path, default=REPO_DATA / "vehicles_info.yaml")
+    p.add_argument("--pool-size", type=int, default=10, help="cars per batch [default: 10]")
+    p.add_argument("--ks", type=int, nargs="+", default=[1, 2, 3, 5])
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--out", type=Path, help="also write the report as JSON")
+    args = p.parse_args()
+
+    _, texts, pairs = load_labelled_pairs(args.questions, args.vehicles)
+    report = recall_at_k(BiEncoder(args.model), texts, pairs, args.pool_size, args.ks, args.seed)
+    report["model"] = args.model
+
+    print(f"{report['positives']} positive pairs, pool of {args.pool_size} cars")
+    for k in args.ks:
+        print(
+            f"  k={k:<3} recall={report['recall'][str(k)]:.3f}"
+            f"  cross-encoder pairs kept={report['kept_pairs'][str(k)]:.0%}"
+        )
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
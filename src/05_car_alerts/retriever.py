@@ -0,0 +1,105 @@
+"""
+Bi‑encoder first stage for the retrieve‑then‑rerank matcher.
+
+Queries and vehicle descriptions are embedded independently with a small
+sentence encoder (mean pooling, L2 normalised). Cosine similarity is then a
+single matrix product and only the top‑k cars per query are sent to the
+DeBERTa cross‑encoder.
+"""
+
+# standard library
+from collections import OrderedDict
+
+# third party libraries
+import numpy as np
+import torch
+from transformers import AutoModel, AutoTokenizer
+
+# project imports
+from token_cache import content_hash
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class BiEncoder:
+    """
+    Embed texts with a Hugging Face encoder; embeddings are cached by content hash.
+
+    :param model_path:  hub id or local directory of the encoder
+    :param max_length:  token limit per text
+    :param batch_size:  texts per forward pass
+    :param max_entries: cached embeddings before the oldest is dropped
+    """
+
+    def __init__(
+        self,
+        model_path: str = DEFAULT_MODEL,
+        max_length: int = 256,
+        batch_size: int = 64,
+        max_entries: int = 50_000,
+    ):
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self.model = AutoModel.from_pretrained(model_path)
+        self.model.eval()
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.model.to(self.device)
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.max_entries = max_entries
+        self._cache: OrderedDict[str, np.ndarray] = OrderedDict()
+
+    def _embed_batch(self, texts: list[str]) -> np.ndarray:
+        batch = self.tokenizer(
+            texts,
+            truncation=True,
+            max_length=self.max_length,
+            padding="longest",
+            return_tensors="pt",
+        )
+        batch = {k: v.to(self.device) for k, v in batch.items()}
+        with torch.no_grad():
+            hidden = self.model(**batch).last_hidden_state
+        # mean over real tokens, then unit length so dot product == cosine
+        mask = batch["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        pooled = torch.nn.functional.normalize(pooled, dim=-1)
+        return pooled.float().cpu().numpy()
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Return a float32 array (len(texts) × dim) of unit vectors."""
+        keys = [content_hash(t) for t in texts]
+        missing = {k: t for k, t in zip(keys, texts) if k not in self._cache}
+
+        if missing:
+            todo = list(missing.items())
+            # similar lengths per batch keep padding low
+            todo.sort(key=lambda kt: len(kt[1]))
+            for start in range(0, len(todo), self.batch_size):
+                chunk = todo[start : start + self.batch_size]
+                vectors = self._embed_batch([t for _, t in chunk])
+                for (k, _), vec in zip(chunk, vectors):
+                    self._cache[k] = vec
+
+        out = np.stack([self._cache[k] for k in keys]) if keys else np.empty((0, 0), np.float32)
+        for k in keys:
+            self._cache.move_to_end(k)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return out
+
+    def similarity(self, queries: list[str], texts: list[str]) -> np.ndarray:
+        """Cosine similarity matrix (queries × texts)."""
+        return self.embed(queries) @ self.embed(texts).T
+
+
+def top_k_mask(similarity: np.ndarray, k: int) -> np.ndarray:
+    """Bool mask (same shape) that keeps the *k* most similar columns of every row."""
+    n_rows, n_cols = similarity.shape
+    if k >= n_cols:
+        return np.ones(similarity.shape, dtype=bool)
+    mask = np.zeros(similarity.shape, dtype=bool)
+    if k <= 0 or n_rows == 0:
+        return mask
+    top = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+    mask[np.arange(n_rows)[:, None], top] = True
+    return mask
@@ -14,7 +14,8 @@ from apscheduler.triggers.cron import CronTrigger
 from pytz import timezone
 
 # project imports
-from orchestrator import run_daily_job
+import metrics
+from orchestrator import METRICS_PORT, run_daily_job
 
 
 # ------------------------------------------------------------------ #
@@ -56,6 +57,9 @@ def start(hour: int, minute: int, log: logging.Logger):
         max_instances=1,
     )
 
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)  # scraped between runs too
+
     log.info("Scheduler started – waiting for %02d:%02d Europe/Berlin …", hour, minute)
     sched.start()
 
@@ -0,0 +1,151 @@
+"""
+Persistent (query, vehicle, model) → score store backed by SQLite.
+
+Keys are content hashes, so an entry is reused only while the query text,
+the vehicle description and the model directory are all unchanged. The
+daily job, the matcher service, the backfill and replays share one file,
+possibly with different models or queries, so nothing is dropped because
+it is foreign to the opener: rows expire by age and by a total row cap,
+checked whenever a cache is opened.
+"""
+
+# standard library
+import hashlib
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable
+from pathlib import Path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    model        TEXT NOT NULL,
+    query_hash   TEXT NOT NULL,
+    vehicle_hash TEXT NOT NULL,
+    score        REAL NOT NULL,
+    written      REAL NOT NULL,
+    PRIMARY KEY (model, query_hash, vehicle_hash)
+) WITHOUT ROWID
+"""
+_INDEX = "CREATE INDEX IF NOT EXISTS scores_written ON scores (written)"
+_CHUNK = 500  # stay well below SQLite's host‑parameter limit
+# written below the model directory from its weights (onnx_backend exports)
+_DERIVED_DIRS = frozenset({"onnx"})
+
+
+def model_fingerprint(model_path: str | Path, *extra: object) -> str:
+    """
+    Hash name, size and mtime of every file below *model_path*.
+
+    Re‑training or swapping the model changes the fingerprint; ONNX exports
+    in ``onnx/`` subdirectories are derived from it and left out, so a first
+    export or a parity check does not orphan the cached scores. For hub ids
+    (no local directory) the id itself is hashed. *extra* lets callers mix in
+    inference settings that change scores, e.g. ``max_length``.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    root = Path(model_path)
+    if root.is_dir():
+        files = (
+            p
+            for p in root.rglob("*")
+            if p.is_file() and _DERIVED_DIRS.isdisjoint(p.relative_to(root).parts[:-1])
+        )
+        for f in sorted(files):
+            st = f.stat()
+            h.update(f"{f.relative_to(root).as_posix()}:{st.st_size}:{st.st_mtime_ns};".encode())
+    else:
+        h.update(str(model_path).encode())
+    for item in extra:
+        h.update(f"|{item}".encode())
+    return h.hexdigest()
+
+
+class ScoreCache:
+    """
+    SQLite score store for one model fingerprint.
+
+    :param path:         database file (created on demand)
+    :param model:        fingerprint from :func:`model_fingerprint`
+    :param max_age_days: rows written longer ago expire, whatever their model (0 = never)
+    :param max_rows:     rows kept in the file at most, newest first (0 = no cap)
+    """
+
+    def __init__(
+        self, path: str | Path, model: str, max_age_days: float = 30, max_rows: int = 2_000_000
+    ):
+        self.path = Path(path)
+        self.model = model
+        self.max_age_days = max_age_days
+        self.max_rows = max_rows
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(self.path, check_same_thread=False)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute(_SCHEMA)
+        self._con.execute(_INDEX)
+        self._con.commit()
+        self.expire()
+
+    def expire(self) -> int:
+        """Delete rows past *max_age_days* and the oldest beyond *max_rows*; returns rows removed."""
+        removed = 0
+        with self._lock:
+            if self.max_age_days:
+                cutoff = time.time() - self.max_age_days * 86400
+                removed += self._con.execute(
+                    "DELETE FROM scores WHERE written < ?", (cutoff,)
+                ).rowcount
+            if self.max_rows:
+                count = self._con.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+                if count > self.max_rows:
+                    removed += self._con.execute(
+                        "DELETE FROM scores WHERE (model, query_hash, vehicle_hash) IN ("
+                        "SELECT model, query_hash, vehicle_hash FROM scores "
+                        "ORDER BY written LIMIT ?)",
+                        (count - self.max_rows,),
+                    ).rowcount
+            self._con.commit()
+        return removed
+
+    def get_many(self, keys: Iterable[tuple[str, str]]) -> dict[tuple[str, str], float]:
+        """Return the cached scores for the given ``(query_hash, vehicle_hash)`` keys."""
+        by_query: dict[str, set[str]] = {}
+        for q_hash, v_hash in keys:
+            by_query.setdefault(q_hash, set()).add(v_hash)
+
+        found: dict[tuple[str, str], float] = {}
+        with self._lock:
+            for q_hash, v_hashes in by_query.items():
+                v_list = list(v_hashes)
+                for i in range(0, len(v_list), _CHUNK):
+                    chunk = v_list[i : i + _CHUNK]
+                    rows = self._con.execute(
+                        "SELECT vehicle_hash, score FROM scores "
+                        "WHERE model = ? AND query_hash = ? "
+                        f"AND vehicle_hash IN ({','.join('?' * len(chunk))})",
+                        (self.model, q_hash, *chunk),
+                    )
+                    for v_hash, score in rows:
+                        found[(q_hash, v_hash)] = score
+        return found
+
+    def put_many(self, items: Iterable[tuple[str, str, float]]) -> None:
+        """Store ``(query_hash, vehicle_hash, score)`` rows."""
+        now = time.time()
+        with self._lock:
+            self._con.executemany(
+                "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?)",
+                ((self.model, q, v, float(s), now) for q, v, s in items),
+            )
+            self._con.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._con.execute(
+                "SELECT COUNT(*) FROM scores WHERE model = ?", (self.model,)
+            ).fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._con.close()
@@ -0,0 +1,98 @@
+"""
+Cross‑encoder scoring in forked worker processes (matcher.workers).
+
+At 512 tokens a micro‑batch of a few dozen pairs keeps PyTorch's intra‑op
+threads poorly busy, so on a CPU host more cores are better spent on more
+micro‑batches at once. ``ScoringPool`` forks *workers* processes right after
+the model is loaded: they inherit tokenizer and weights copy‑on‑write (the
+weights are never written, so the pages stay shared) and each runs with
+*threads_per_worker* intra‑op threads. ONNX Runtime sessions are opened
+again in every worker, their thread pools do not survive a fork.
+
+``CarMatcher`` still sorts the pairs of a call by length and cuts them into
+micro‑batches; the pool spreads those over the workers and hands the
+scores back in order. Forward passes are timed in the workers and recorded
+in the parent's metrics, together with the counters the backend bumped
+there (e.g. the fold passes of the ensemble). Tokenization stays in the
+parent, so the token cache metrics need no forwarding.
+
+Fork is required (Linux / macOS); the workers must be forked before the
+parent runs inference itself, which is why the matcher starts them at once.
+"""
+
+# standard library
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# third party libraries
+import numpy as np
+
+# project imports
+import metrics
+
+# the matcher being served; set before the fork, inherited by every worker
+_matcher = None
+
+
+def can_fork() -> bool:
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def _init_worker(threads: int) -> None:
+    metrics.REGISTRY.reset()  # the parent's values, copied by the fork
+    _matcher.backend = _matcher.backend.for_worker(threads)
+
+
+def _pid() -> int:
+    return os.getpid()
+
+
+def _score(features: list[dict]) -> tuple[np.ndarray, float, dict]:
+    """Scores of one micro‑batch, the seconds of the forward pass and the counters it bumped."""
+    batch = _matcher.tokenizer.pad(features, padding="longest", return_tensors="np")
+    start = time.perf_counter()
+    probs = _matcher.backend.predict_proba(batch)
+    return probs, time.perf_counter() - start, metrics.REGISTRY.take_counters()
+
+
+class ScoringPool:
+    """
+    :param matcher:            loaded CarMatcher (tokenizer and backend are used)
+    :param workers:            scoring processes
+    :param threads_per_worker: intra‑op threads of each (0 = cores / workers)
+    """
+
+    def __init__(self, matcher, workers: int, threads_per_worker: int = 0):
+        global _matcher
+        if not can_fork():
+            raise RuntimeError("ScoringPool needs the 'fork' start method")
+        self.workers = workers
+        self.threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        _matcher = matcher
+        self._executor = ProcessPoolExecutor(
+            workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker,
+            initargs=(self.threads,),
+        )
+        # with fork, the first submit starts every worker
+        self.pids = sorted({self._executor.submit(_pid).result() for _ in range(workers)})
+
+    def _record(self, probs: np.ndarray, seconds: float, counters: dict) -> np.ndarray:
+        metrics.REGISTRY.add_counters(counters)
+        metrics.observe("model_forward_seconds", seconds)
+        metrics.inc("pairs_scored_total", len(probs))
+        return probs
+
+    def forward(self, features: list[dict]) -> np.ndarray:
+        """Score one micro‑batch in a worker (drop‑in for ``CarMatcher._forward``)."""
+        return self._record(*self._executor.submit(_score, features).result())
+
+    def map(self, batches: list[list[dict]]) -> list[np.ndarray]:
+        """Score micro‑batches on all workers at once; results in input order."""
+        return [self._record(*result) for result in self._executor.map(_score, batches)]
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
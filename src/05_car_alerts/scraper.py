@@ -8,25 +8,24 @@ from collections.abc import Iterator
 
 # project imports
 from article_parser import ArticleLinkParser
+from parse_pool import ParsePool
 
 
-def vehicle_generator(base_url: str, max_pages: int) -> Iterator[dict]:
+def vehicle_generator(
+    base_url: str,
+    max_pages: int,
+    parse_workers: int = 2,
+    extractor: str = "soup",
+    raw_html_dir: str | None = None,
+) -> Iterator[dict]:
     """Yield dicts shaped like the JSON you already save."""
     parser = ArticleLinkParser(headless=True, delay_range=(1, 2))
+    parse_pool = ParsePool(parse_workers, extractor=extractor, raw_html_dir=raw_html_dir)
 
     try:
-        links = parser.scrape_all_links(base_url, max_pages)
-
-        for url in links:
-            soup = parser.get_vehicle_soup(url)
-            info = parser.parse_table_after_header(soup, "Information")
-            details, text = parser.parse_vehicle_details(soup)
-
-            yield {
-                "url": url,
-                "information": {k.rstrip(":"): v for k, v in info},
-                "details_list": details,
-                "details_text": text,
-            }
+        links = (url for chunk in parser.scrape_all_links(base_url, max_pages) for url in chunk)
+        # Chrome fetches the next pages while workers parse the previous ones
+        yield from parse_pool.imap((url, parser.get_vehicle_html(url)) for url in links)
     finally:
+        parse_pool.close()
         parser.close()
@@ -0,0 +1,202 @@
+"""
+Compressed, content‑addressed store of fetched pages (scraper.snapshot_dir).
+
+Every listing and vehicle page the scraper loads is kept as one blob per
+distinct page source (``blobs/<sha[:2]>/<sha>.zst``, zlib if zstandard is
+not installed) plus a line in ``index.jsonl`` naming the run, the kind of
+page and its URL. ``ReplayParser`` serves a recorded run back through the
+``ArticleLinkParser`` interface without a browser or network, so
+``python orchestrator.py --replay`` re‑runs scrape → parse → match offline.
+
+    python snapshot_store.py runs
+    python snapshot_store.py export out_dir --run 20261016T060000
+"""
+
+# standard library
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+import zlib
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urljoin
+
+# third party libraries
+from bs4 import BeautifulSoup
+
+# project imports
+from article_parser import ArticleLinkParser
+
+try:
+    # third party libraries
+    import zstandard
+except ImportError:  # zlib fallback, ~2x larger blobs
+    zstandard = None
+
+SNAPSHOT_DIR = Path(__file__).resolve().parent / "data" / "snapshots"
+
+
+class SnapshotStore:
+    """
+    :param root:  store directory (``index.jsonl`` + ``blobs/``)
+    :param level: compression level
+    """
+
+    def __init__(self, root: str | Path = SNAPSHOT_DIR, level: int = 10):
+        self.root = Path(root)
+        self.blob_dir = self.root / "blobs"
+        self.index_file = self.root / "index.jsonl"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.level = level
+        # pages written by this process belong to one run
+        self.run = datetime.now().strftime("%Y%m%dT%H%M%S")
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------ #
+    #  Blobs
+    # ------------------------------------------------------------------ #
+    def _blob_path(self, sha: str, ext: str) -> Path:
+        return self.blob_dir / sha[:2] / f"{sha}{ext}"
+
+    def _compress(self, data: bytes) -> tuple[bytes, str]:
+        if zstandard is not None:
+            return zstandard.ZstdCompressor(level=self.level).compress(data), ".zst"
+        return zlib.compress(data, min(self.level, 9)), ".z"
+
+    def put(self, url: str, html: str, kind: str = "vehicle") -> str:
+        """Store a page source (once per distinct content) and index it under this run."""
+        data = html.encode("utf-8")
+        sha = hashlib.sha256(data).hexdigest()
+        if not any(self._blob_path(sha, ext).exists() for ext in (".zst", ".z")):
+            blob, ext = self._compress(data)
+            path = self._blob_path(sha, ext)
+            path.parent.mkdir(exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(blob)
+            os.replace(tmp, path)
+
+        line = json.dumps(
+            {
+                "run": self.run,
+                "kind": kind,
+                "url": url,
+                "sha": sha,
+                "ts": datetime.now().isoformat(timespec="seconds"),
+            }
+        )
+        with self._lock, self.index_file.open("a", encoding="utf-8") as fh:
+            fh.write(line + "\n")
+        return sha
+
+    def get(self, sha: str) -> str:
+        zst = self._blob_path(sha, ".zst")
+        if zst.exists():
+            if zstandard is None:
+                raise ImportError("snapshot was written with zstd: pip install zstandard")
+            data = zstandard.ZstdDecompressor().decompress(zst.read_bytes())
+        else:
+            data = zlib.decompress(self._blob_path(sha, ".z").read_bytes())
+        return data.decode("utf-8")
+
+    # ------------------------------------------------------------------ #
+    #  Index
+    # ------------------------------------------------------------------ #
+    def _entries(self):
+        if not self.index_file.exists():
+            return
+        with self.index_file.open(encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:  # torn last line
+                    continue
+
+    def runs(self) -> dict[str, dict[str, int]]:
+        """``{run: {kind: pages}}``, oldest run first."""
+        runs: dict[str, dict[str, int]] = {}
+        for e in self._entries():
+            kinds = runs.setdefault(e["run"], {})
+            kinds[e["kind"]] = kinds.get(e["kind"], 0) + 1
+        return dict(sorted(runs.items()))
+
+    def pages(self, run: str | None = None) -> dict[tuple[str, str], str]:
+        """``{(kind, url): sha}`` of one run (default: the latest); the last write wins."""
+        run = run or next(reversed(self.runs()), None)
+        return {(e["kind"], e["url"]): e["sha"] for e in self._entries() if e["run"] == run}
+
+
+class ReplayParser(ArticleLinkParser):
+    """
+    ``ArticleLinkParser`` that answers from a recorded run instead of Chrome.
+
+    Only vehicle pages that were recorded are yielded, so a run made with
+    ``incremental`` or a partly filled sent cache replays exactly what it fetched.
+
+    :param store: snapshot store to read
+    :param run:   run id (default: the latest)
+    """
+
+    def __init__(self, store: SnapshotStore, run: str | None = None):
+        self.store = store
+        self.pages = store.pages(run)
+        super().__init__(headless=True, delay_range=(0, 0))
+        self.logger.info("Replaying %d recorded pages", len(self.pages))
+
+    def setup_driver(self, headless: bool = False):
+        self.driver = None
+
+    def get_all_links(self, url: str) -> list[dict]:
+        sha = self.pages.get(("listing", url))
+        if sha is None:
+            self.logger.warning("No recorded listing page for %s", url)
+            return []
+        soup = BeautifulSoup(self.store.get(sha), "html.parser")
+        return [
+            {"url": urljoin(url, a["href"]), "text": a.get_text(strip=True), "element": None}
+            for a in soup.find_all("a", href=True)
+        ]
+
+    def filter_item_links(self, links: list[dict]) -> list[str]:
+        return [
+            url for url in super().filter_item_links(links) if ("vehicle", url) in self.pages
+        ]
+
+    def get_vehicle_html(self, vehicle_url: str) -> str:
+        return self.store.get(self.pages[("vehicle", vehicle_url)])
+
+    def close(self):
+        pass
+
+
+def main():
+    p = argparse.ArgumentParser(description="Page snapshot store")
+    p.add_argument("--root", type=Path, default=SNAPSHOT_DIR)
+    sub = p.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("runs", help="list recorded runs")
+    exp = sub.add_parser("export", help="write a run's vehicle pages as *.html fixtures")
+    exp.add_argument("out", type=Path)
+    exp.add_argument("--run", help="run id [default: latest]")
+    args = p.parse_args()
+
+    store = SnapshotStore(args.root)
+    if args.cmd == "runs":
+        for run, kinds in store.runs().items():
+            print(run, "  ".join(f"{k}={n}" for k, n in sorted(kinds.items())))
+        return
+
+    # project imports
+    from parse_pool import raw_html_path
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    pages = {url: sha for (kind, url), sha in store.pages(args.run).items() if kind == "vehicle"}
+    for url, sha in pages.items():
+        raw_html_path(args.out, url).write_text(store.get(sha), encoding="utf-8")
+    print(f"Written {len(pages)} pages → {args.out}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    main()
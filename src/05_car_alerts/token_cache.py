@@ -0,0 +1,93 @@
+"""
+Token‑id caches for the cross‑encoder.
+
+Queries and vehicle descriptions are tokenized once (without special tokens)
+and the ids are combined per pair, so tokenizer work scales with
+cars + queries instead of cars × queries.
+"""
+
+# standard library
+import hashlib
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+
+# project imports
+import metrics
+
+# the matcher service scores from several threads; the query and vehicle
+# caches share one fast tokenizer, which must not be entered concurrently
+_LOCK = threading.Lock()
+
+
+def content_hash(text: str) -> str:
+    """Short, stable hash of a text (used to detect changed vehicles / queries)."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class TokenCache:
+    """
+    LRU map ``key -> token ids`` in front of a Hugging Face tokenizer.
+
+    :param tokenizer:   tokenizer used for cache misses
+    :param max_entries: entries kept before the least recently used is dropped
+    """
+
+    def __init__(self, tokenizer, max_entries: int = 50_000):
+        self.tokenizer = tokenizer
+        self.max_entries = max_entries
+        self._ids: OrderedDict[Hashable, list[int]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._ids
+
+    def get_many(self, items: list[tuple[Hashable, str]]) -> list[list[int]]:
+        """
+        Return token ids for every ``(key, text)``; misses are tokenized in one call.
+        """
+        with _LOCK:
+            return self._get_many(items)
+
+    def _get_many(self, items: list[tuple[Hashable, str]]) -> list[list[int]]:
+        found: dict[Hashable, list[int]] = {}
+        missing: dict[Hashable, str] = {}
+        for key, text in items:
+            if key in self._ids:
+                self._ids.move_to_end(key)
+                found[key] = self._ids[key]
+            else:
+                missing.setdefault(key, text)
+
+        self.hits += len(items) - len(missing)
+        self.misses += len(missing)
+        metrics.inc("token_cache_hits_total", len(items) - len(missing))
+        metrics.inc("token_cache_misses_total", len(missing))
+
+        if missing:
+            with metrics.timer("tokenize_seconds"):
+                encoded = self.tokenizer(list(missing.values()), add_special_tokens=False)
+            fresh = dict(zip(missing.keys(), encoded["input_ids"]))
+            found.update(fresh)
+            self._ids.update(fresh)
+            while len(self._ids) > self.max_entries:
+                self._ids.popitem(last=False)
+
+        return [found[key] for key, _ in items]
+
+    def get(self, key: Hashable, text: str) -> list[int]:
+        return self.get_many([(key, text)])[0]
+
+    def discard(self, keys: list[Hashable]) -> None:
+        """Forget *keys* (e.g. deleted queries) before the LRU would."""
+        with _LOCK:
+            for key in keys:
+                self._ids.pop(key, None)
+
+    def clear(self) -> None:
+        with _LOCK:
+            self._ids.clear()
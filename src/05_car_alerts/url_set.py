@@ -0,0 +1,150 @@
+"""
+Compact membership set for autobid.de listing URLs.
+
+Every listing URL ends in a numeric item id
+(``.../item/audi-a3-sportback-sport-30-tfsi-3112251/details``), so the set
+stores 8‑byte ids in a sorted ``int64`` array instead of ~90‑byte strings.
+New ids go to a small pending set that is merged into the array in bulk.
+URLs without an id fall back to an exact string set.
+
+Persistence is append‑only: ``flush`` writes only the ids added since the
+last flush to ``<name>.ids`` (raw little‑endian int64), and fallback URLs
+to ``<name>.urls`` (one per line), so save time does not grow with history.
+"""
+
+# standard library
+import json
+import re
+from collections.abc import Iterable
+from pathlib import Path
+
+# third party libraries
+import numpy as np
+
+_ITEM_ID = re.compile(r"/item/[^/?#]*?-(\d+)(?:/|[?#]|$)")
+_MERGE_AT = 4096  # minimum pending ids before they are merged into the sorted array
+
+
+def _unique_sorted(ids: np.ndarray) -> np.ndarray:
+    """Sorted distinct ids (sort + mask; much faster than ``np.unique`` here)."""
+    ids = np.sort(ids)
+    if len(ids) < 2:
+        return ids
+    return ids[np.concatenate(([True], ids[1:] != ids[:-1]))]
+
+
+def item_id(url: str) -> int | None:
+    """Numeric autobid item id of a listing URL, or ``None``."""
+    m = _ITEM_ID.search(url)
+    return int(m.group(1)) if m else None
+
+
+class ItemIdSet:
+    """
+    Set of listing URLs keyed by item id.
+
+    :param path:        ``.ids`` file for append‑only persistence (``None`` = in memory)
+    :param legacy_json: JSON list of URLs imported once if *path* does not exist yet
+    """
+
+    def __init__(self, path: str | Path | None = None, legacy_json: str | Path | None = None):
+        self.path = Path(path) if path else None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._pending: set[int] = set()
+        self._urls: set[str] = set()
+        self._unsaved_ids: list[int] = []
+        self._unsaved_urls: list[str] = []
+
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            self._load()
+        elif legacy_json and Path(legacy_json).exists():
+            self.update(json.loads(Path(legacy_json).read_text()))
+            self.flush()
+
+    @property
+    def _url_path(self) -> Path:
+        return self.path.with_suffix(".urls")
+
+    def _load(self) -> None:
+        raw = self.path.read_bytes()
+        usable = len(raw) - len(raw) % 8  # a torn last record is ignored
+        # duplicates only appear if two processes appended the same id
+        self._ids = _unique_sorted(np.frombuffer(raw[:usable], dtype="<i8").astype(np.int64))
+        if self._url_path.exists():
+            self._urls = {
+                line for line in self._url_path.read_text(encoding="utf-8").splitlines() if line
+            }
+
+    def _merge(self) -> None:
+        if self._pending:
+            pending = np.fromiter(self._pending, dtype=np.int64, count=len(self._pending))
+            # pending ids are never in the array already
+            self._ids = np.sort(np.concatenate((self._ids, pending)))
+            self._pending.clear()
+
+    def _has_id(self, key: int) -> bool:
+        if key in self._pending:
+            return True
+        pos = np.searchsorted(self._ids, key)
+        return pos < len(self._ids) and self._ids[pos] == key
+
+    # ------------------------------------------------------------------ #
+    #  set‑like API
+    # ------------------------------------------------------------------ #
+    def __contains__(self, url: str) -> bool:
+        key = item_id(url)
+        return url in self._urls if key is None else self._has_id(key)
+
+    def __len__(self) -> int:
+        return len(self._ids) + len(self._pending) + len(self._urls)
+
+    def add(self, url: str) -> None:
+        key = item_id(url)
+        if key is None:
+            if url not in self._urls:
+                self._urls.add(url)
+                self._unsaved_urls.append(url)
+        elif not self._has_id(key):
+            self._pending.add(key)
+            self._unsaved_ids.append(key)
+            # merging at a fixed fraction of the array keeps inserts amortised O(log n)
+            if len(self._pending) >= max(_MERGE_AT, len(self._ids) // 8):
+                self._merge()
+
+    def update(self, urls: Iterable[str]) -> None:
+        """Bulk :meth:`add` with one sort for all ids."""
+        keys = []
+        for url in urls:
+            key = item_id(url)
+            if key is None:
+                self.add(url)
+            else:
+                keys.append(key)
+        if keys:
+            self._merge()
+            keys = _unique_sorted(np.asarray(keys, dtype=np.int64))
+            if len(self._ids):
+                pos = np.minimum(np.searchsorted(self._ids, keys), len(self._ids) - 1)
+                new = keys[self._ids[pos] != keys]
+            else:
+                new = keys
+            self._ids = np.sort(np.concatenate((self._ids, new)))
+            self._unsaved_ids.extend(new.tolist())
+
+    def flush(self) -> None:
+        """Append everything added since the last flush to disk."""
+        if self.path is None:
+            return
+        if self._unsaved_ids:
+            with self.path.open("ab") as fh:
+                fh.write(np.asarray(self._unsaved_ids, dtype="<i8").tobytes())
+            self._unsaved_ids.clear()
+        elif not self.path.exists():
+            self.path.touch()
+        if self._unsaved_urls:
+            with self._url_path.open("a", encoding="utf-8") as fh:
+                fh.write("".join(f"{url}\n" for url in self._unsaved_urls))
+            self._unsaved_urls.clear()
@@ -0,0 +1,229 @@
+"""
+Append‑only vehicle archive (storage.format: jsonl).
+
+Cars are appended to ``data/vehicles_data_N.jsonl``, one
+``{"url", "ts", "car"}`` record per line, instead of re‑loading and
+re‑dumping the whole YAML file after every batch. An in‑memory index of
+item ids (url_set.ItemIdSet) makes dedupe cheap. Each batch is a single ``write`` + ``fsync``;
+a torn last line from a crash is cut off on the next open, and a new file
+is started once the current one holds *rollover* cars.
+
+Run with terminal from root directory 05_car_alerts:
+
+    python vehicle_store.py migrate             # vehicles_data_*.yaml → jsonl
+    python vehicle_store.py export --out export # jsonl → vehicles_data_*.yaml
+"""
+
+# standard library
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from pathlib import Path
+
+# third party libraries
+import yaml
+
+# project imports
+from url_set import ItemIdSet
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+ROLLOVER = 3000
+Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+Dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+
+def _numbered(data_dir: Path, suffix: str) -> list[Path]:
+    """``vehicles_data_N<suffix>`` files ordered by N (2 before 10)."""
+    pattern = re.compile(rf"vehicles_data_(\d+){re.escape(suffix)}$")
+    files = [
+        (int(m.group(1)), path)
+        for path in data_dir.glob(f"vehicles_data_*{suffix}")
+        if (m := pattern.match(path.name))
+    ]
+    return [path for _, path in sorted(files)]
+
+
+class VehicleStore:
+    """
+    JSON Lines archive with a URL index.
+
+    :param data_dir: directory holding ``vehicles_data_N.jsonl``
+    :param rollover: cars per file before a new one is started
+    """
+
+    def __init__(self, data_dir: str | Path = DATA_DIR, rollover: int = ROLLOVER):
+        self.logger = logging.getLogger("Orchestrator")
+        self.data_dir = Path(data_dir)
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.rollover = rollover
+        self._urls = ItemIdSet()
+        self._lock = threading.Lock()
+
+        files = _numbered(self.data_dir, ".jsonl")
+        for path in files:
+            self._repair_tail(path)
+            self._urls.update(record["url"] for record in self._read(path))
+        self._current = files[-1] if files else self.data_dir / "vehicles_data_1.jsonl"
+        self._current_rows = sum(1 for _ in self._read(self._current))
+        if self._current_rows >= rollover:
+            self._current, self._current_rows = self._next_file(), 0
+
+    # ------------------------------------------------------------------ #
+    #  File helpers
+    # ------------------------------------------------------------------ #
+    @staticmethod
+    def _read(path: Path) -> Iterator[dict]:
+        if not path.exists():
+            return
+        with path.open("r", encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+
+    @staticmethod
+    def _repair_tail(path: Path) -> None:
+        """Drop a partially written last line (crash during append)."""
+        with path.open("rb+") as fh:
+            fh.seek(0, os.SEEK_END)
+            size = fh.tell()
+            if size == 0:
+                return
+            fh.seek(size - 1)
+            if fh.read(1) == b"\n":
+                return
+            fh.seek(0)
+            keep = fh.read().rfind(b"\n") + 1
+            fh.truncate(keep)
+
+    def _next_file(self) -> Path:
+        idx = int(self._current.stem.split("_")[-1]) + 1
+        return self.data_dir / f"vehicles_data_{idx}.jsonl"
+
+    def _write(self, lines: list[str]) -> None:
+        with self._current.open("a", encoding="utf-8") as fh:
+            fh.write("".join(lines))
+            fh.flush()
+            os.fsync(fh.fileno())
+        self._current_rows += len(lines)
+
+    # ------------------------------------------------------------------ #
+    #  Public API
+    # ------------------------------------------------------------------ #
+    def __contains__(self, url: str) -> bool:
+        return url in self._urls
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+    def append(self, cars: Iterable[dict], ts: str | None = None) -> int:
+        """
+        Append cars whose URL is not archived yet.
+
+        :param cars: parsed vehicle dicts (must have ``url``)
+        :param ts:   timestamp stored with the rows (default: now)
+        :return:     number of cars written
+        """
+        if ts is None:
+            ts = datetime.now().isoformat(timespec="seconds")
+        added = 0
+        with self._lock:
+            lines: list[str] = []
+            for car in cars:
+                url = car["url"]
+                if url in self._urls:
+                    continue
+                self._urls.add(url)
+                lines.append(
+                    json.dumps({"url": url, "ts": ts, "car": car}, ensure_ascii=False) + "\n"
+                )
+                added += 1
+                if self._current_rows + len(lines) >= self.rollover:
+                    self._write(lines)
+                    self.logger.info("Saved %d rows → %s", self._current_rows, self._current.name)
+                    lines = []
+                    self._current = self._next_file()
+                    self._current_rows = 0
+            if lines:
+                self._write(lines)
+        if added:
+            self.logger.info("Appended %d new rows → %s", added, self._current.name)
+        return added
+
+    def iter_records(self) -> Iterator[dict]:
+        """Yield ``{"url", "ts", "car"}`` records, oldest first."""
+        for path in _numbered(self.data_dir, ".jsonl"):
+            yield from self._read(path)
+
+    def iter_cars(self) -> Iterator[dict]:
+        for record in self.iter_records():
+            yield record["car"]
+
+    # ------------------------------------------------------------------ #
+    #  YAML migration / export
+    # ------------------------------------------------------------------ #
+    def migrate_yaml(self, yaml_dir: str | Path | None = None) -> int:
+        """Import every ``vehicles_data_N.yaml`` (rows get an empty ``ts``)."""
+        added = 0
+        for path in _numbered(Path(yaml_dir or self.data_dir), ".yaml"):
+            with path.open("r", encoding="utf-8") as fh:
+                try:
+                    rows = yaml.load(fh, Loader=Loader) or {}
+                except yaml.YAMLError as exc:
+                    self.logger.error("Skipping %s: %s", path.name, exc)
+                    continue
+            n = self.append(rows.values(), ts="")
+            self.logger.info("Migrated %d rows from %s", n, path.name)
+            added += n
+        return added
+
+    def export_yaml(self, out_dir: str | Path) -> list[Path]:
+        """Write the archive as ``vehicles_data_N.yaml`` files of *rollover* cars."""
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        written: list[Path] = []
+
+        def flush(rows: dict):
+            path = out_dir / f"vehicles_data_{len(written) + 1}.yaml"
+            with path.open("w", encoding="utf-8") as fh:
+                yaml.dump(rows, fh, Dumper=Dumper, allow_unicode=True)
+            written.append(path)
+
+        rows: dict[str, dict] = {}
+        for car in self.iter_cars():
+            rows[car["url"]] = car
+            if len(rows) == self.rollover:
+                flush(rows)
+                rows = {}
+        if rows:
+            flush(rows)
+        return written
+
+
+def main():
+    p = argparse.ArgumentParser(description="Vehicle archive maintenance")
+    p.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    mig = sub.add_parser("migrate", help="import vehicles_data_*.yaml into the jsonl archive")
+    mig.add_argument("--yaml-dir", type=Path, help="where the YAML files live [default: data dir]")
+
+    exp = sub.add_parser("export", help="write the archive back to YAML for the notebooks")
+    exp.add_argument("--out", type=Path, required=True)
+    args = p.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    store = VehicleStore(args.data_dir)
+    if args.cmd == "migrate":
+        print(f"Migrated {store.migrate_yaml(args.yaml_dir)} cars, archive holds {len(store)}")
+    else:
+        for path in store.export_yaml(args.out):
+            print(f"Written {path}")
+
+
+if __name__ == "__main__":
+    main()